@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+
+CACHE_VERSION = 2
+
+
+def cache_path(filename):
+    """Cache file lives next to the workbook"""
+    return filename + ".cache"
+
+def file_hash(filename):
+    """Content hash of the workbook"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def file_key(filename):
+    """Path, size and modification time of the workbook (content hash is added on demand)"""
+    st = os.stat(filename)
+    return {"path": os.path.abspath(filename), "size": st.st_size, "mtime": st.st_mtime_ns}
+
+def _read_cache(filename):
+    try:
+        with open(cache_path(filename), "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("version") != CACHE_VERSION:
+            return None
+        return cache
+    except (OSError, ValueError):
+        return None
+
+def _write_cache(filename, key, data):
+    """Store data as header list + row lists, ignore errors (cache is optional)"""
+    headers = list(data[0].keys()) if data else []
+    cache = {
+        "version": CACHE_VERSION,
+        "key": key,
+        "headers": headers,
+        "rows": [[rec.get(h) for h in headers] for rec in data],
+    }
+    tmp_path = f"{cache_path(filename)}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, cache_path(filename))
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+def _cache_data(cache):
+    headers = cache["headers"]
+    return [dict(zip(headers, row)) for row in cache["rows"]]
+
+def file_unchanged(filename, key):
+    """Check if workbook still matches key returned by load_cached_data()"""
+    if not key:
+        return False
+    try:
+        current = file_key(filename)
+    except OSError:
+        return False
+    if current["path"] != key.get("path") or current["size"] != key.get("size"):
+        return False
+    if current["mtime"] == key.get("mtime"):
+        return True
+    # Touched but maybe not changed
+    return key.get("hash") is not None and file_hash(filename) == key["hash"]
+
+def load_cached_data(filename, load_fn):
+    """Load data from snapshot cache if the workbook is unchanged, otherwise
+    parse it with load_fn(filename) -> (data, error) and rebuild the cache
+
+    Returns (data, error, key), key identifies the loaded workbook version.
+    """
+    try:
+        key = file_key(filename)
+    except OSError:
+        return load_fn(filename) + (None,)
+
+    cache = _read_cache(filename)
+    if cache:
+        cached_key = cache["key"]
+        same_path = cached_key.get("path") == key["path"]
+        if same_path and cached_key.get("size") == key["size"] and cached_key.get("mtime") == key["mtime"]:
+            return _cache_data(cache), None, cached_key
+        # Touched or copied but same content - reuse and update the key
+        if same_path and cached_key.get("size") == key["size"]:
+            key["hash"] = file_hash(filename)
+            if cached_key.get("hash") == key["hash"]:
+                data = _cache_data(cache)
+                _write_cache(filename, key, data)
+                return data, None, key
+
+    data, error = load_fn(filename)
+    if error:
+        return data, error, None
+    if "hash" not in key:
+        key["hash"] = file_hash(filename)
+    _write_cache(filename, key, data)
+    return data, None, key
@@ -0,0 +1,210 @@
+import os
+import re
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+
+# Files in the drawings folder that count as drawings (other files are ignored)
+DRAWING_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".pdf")
+
+REPORT_MAX_LINES = 2000  # Lines listed per section of the report
+SCAN_RETRY_SECONDS = (5, 300)  # First and longest wait before reading the folder again after an error
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def drawing_file(crtez):
+    """File name of the drawing for a drawing number, None without a number"""
+    crtez = "" if crtez is None else str(crtez).strip()
+    if not crtez:
+        return None
+    return crtez.replace("/", "-").replace("\\", "-") + ".jpg"
+
+def _stem(name):
+    """File name without extension, in lower case"""
+    return os.path.splitext(name)[0].lower()
+
+def drawing_key(name):
+    """File name or drawing number without extension, case and separators"""
+    stem, ext = os.path.splitext(name)
+    if ext.lower() not in DRAWING_EXTENSIONS:
+        stem = name
+    return _SEPARATORS.sub("", stem.lower())
+
+def mismatch_kind(expected, actual):
+    """How a file name differs from the expected one"""
+    expected_stem, expected_ext = os.path.splitext(expected)
+    actual_stem, actual_ext = os.path.splitext(actual)
+    if expected_stem.lower() != actual_stem.lower():
+        return "razdvojnici"
+    if expected_ext.lower() != actual_ext.lower():
+        return "ekstenzija"
+    return "velika/mala slova"
+
+
+class DrawingIndex:
+    """Names of the files in the drawings folder, read with one os.scandir
+
+    Lookups go to the file names in memory instead of asking the share
+    with os.path.exists for every drawing. A file that differs from the
+    expected name only in case or extension is found if it is the only one;
+    files that also differ in separators (drawing_key()) are only listed
+    by report(). scan() builds the index anew and swaps it in at once, so
+    it can run on a watcher thread. Until the first scan succeeds, path()
+    returns the expected path unchecked (whoever opens it checks it);
+    start() keeps retrying a failed scan.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.error = None
+        self.scan_seconds = 0.0
+        self._state = None  # (file names, names by _stem, names by drawing_key)
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Scan in the background, again after a while until it succeeds"""
+        threading.Thread(target=self._scan_until_ready, daemon=True).start()
+
+    def _scan_until_ready(self):
+        wait, longest = SCAN_RETRY_SECONDS
+        while not self.scan()[0] and not self.ready:
+            time.sleep(wait)
+            wait = min(wait * 2, longest)
+
+    def scan(self):
+        """Read the folder, return (success, error)"""
+        with self._lock:
+            start = time.perf_counter()
+            files = set()
+            stems = {}
+            keys = {}
+            try:
+                with os.scandir(self.folder) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            files.add(entry.name)
+            except OSError as e:
+                self.error = f"Greška pri čitanju foldera '{self.folder}': {str(e)}"
+                return False, self.error
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in DRAWING_EXTENSIONS:
+                    stems.setdefault(_stem(name), []).append(name)
+                    keys.setdefault(drawing_key(name), []).append(name)
+            self._state = (files, stems, keys)
+            self.error = None
+            self.scan_seconds = time.perf_counter() - start
+        return True, None
+
+    @property
+    def ready(self):
+        return self._state is not None
+
+    def __len__(self):
+        return 0 if self._state is None else len(self._state[0])
+
+    def path(self, crtez):
+        """Path of the drawing for a drawing number, None if there is none
+
+        The expected file name if it exists, otherwise the one file that
+        differs from it only in case or extension. Before the folder has
+        been read, the expected path without checking it.
+        """
+        name = drawing_file(crtez)
+        if name is None:
+            return None
+        state = self._state
+        if state is None:
+            return os.path.join(self.folder, name)
+        files, stems, _ = state
+        if name in files:
+            return os.path.join(self.folder, name)
+        matches = stems.get(_stem(name), ())
+        return os.path.join(self.folder, matches[0]) if len(matches) == 1 else None
+
+    def report(self, data):
+        """Compare the drawing numbers of all records in data with the folder
+
+        Returns a dict with missing [(idx, crtez)], mismatched
+        [(idx, crtez, file name, kind)], orphans [file names of drawings no
+        record uses], the number of records without a drawing number and
+        the seconds it took.
+        """
+        start = time.perf_counter()
+        files, _, keys = self._state or (set(), {}, {})
+        numbers = data.column("CRTEZBROJ") if hasattr(data, "column") else \
+            [rec.get("CRTEZBROJ") for rec in data]
+        missing = []
+        mismatched = []
+        used = set()
+        no_number = 0
+        for idx, crtez in enumerate(numbers):
+            name = drawing_file(crtez)
+            if name is None:
+                no_number += 1
+            elif name in files:
+                used.add(name)
+            else:
+                matches = keys.get(drawing_key(name))
+                if len(matches or ()) > 1:
+                    mismatched.append((idx, crtez, ", ".join(matches), "više fajlova"))
+                    used.update(matches)
+                elif matches:
+                    mismatched.append((idx, crtez, matches[0], mismatch_kind(name, matches[0])))
+                    used.update(matches)
+                else:
+                    missing.append((idx, crtez))
+        orphans = [name for names in keys.values() for name in names if name not in used]
+        orphans.sort()
+        return {
+            "records": len(numbers),
+            "files": len(files),
+            "missing": missing,
+            "mismatched": mismatched,
+            "orphans": orphans,
+            "no_number": no_number,
+            "scan_seconds": self.scan_seconds,
+            "seconds": time.perf_counter() - start,
+        }
+
+
+def format_report(report, folder, limit=REPORT_MAX_LINES):
+    """Text of a report() for the report window"""
+    lines = [
+        f"Folder: {folder}",
+        f"Unosa: {report['records']}, fajlova u folderu: {report['files']}",
+        f"Unosi bez broja crteža: {report['no_number']}",
+        f"Folder je pročitan za {report['scan_seconds']:.2f} s, "
+        f"izveštaj je napravljen za {report['seconds']:.2f} s",
+    ]
+
+    def section(title, items, line):
+        lines.append("")
+        lines.append(f"{title}: {len(items)}")
+        lines.extend(line(item) for item in items[:limit])
+        if len(items) > limit:
+            lines.append(f"... i još {len(items) - limit}")
+
+    section("Crteži koji nedostaju", report["missing"],
+            lambda item: f"  red {item[0] + 1}: {item[1]}")
+    section("Pogrešno imenovani fajlovi", report["mismatched"],
+            lambda item: f"  red {item[0] + 1}: {item[1]} -> {item[2]} ({item[3]})")
+    section("Fajlovi bez unosa", report["orphans"], lambda name: f"  {name}")
+    return "\n".join(lines)
+
+def show_report(root, title, text):
+    """Read-only text window"""
+    window = tk.Toplevel(root)
+    window.title(title)
+    window.geometry("800x600")
+    frame = ttk.Frame(window)
+    frame.pack(fill=tk.BOTH, expand=True)
+    scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL)
+    text_widget = tk.Text(frame, wrap="none", yscrollcommand=scrollbar.set)
+    scrollbar.configure(command=text_widget.yview)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    text_widget.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    text_widget.insert("1.0", text)
+    text_widget.configure(state="disabled")
+    return window
@@ -1,5 +1,4 @@
 import os
-import re
 import tkinter as tk
 from tkinter import ttk, messagebox
 import tkinter.font as tkFont
@@ -8,6 +7,16 @@ from openpyxl import load_workbook
 from openpyxl import Workbook
 import shutil
 from datetime import datetime
+from baza_crteza_sqlite import (load_sqlite_data, replace_sqlite_data,
+                                save_sqlite_record, delete_sqlite_record)
+from baza_crteza_journal import EditJournal, BackgroundCompactor
+from baza_crteza_saver import BackgroundWorker
+from baza_crteza_shards import ShardedSearch
+from baza_crteza_table import RecordTable, ResultsPanel
+from baza_crteza_preview import ThumbnailCache, DrawingPreview, neighbours
+from baza_crteza_drawings import DrawingIndex, drawing_file, format_report, show_report
+from baza_crteza_store import RecordStore
+from baza_crteza_search import SearchCache, parse_query, result_count, SEARCH_MODES
 
 def load_config():
     config_file = "config.txt"
@@ -36,6 +45,26 @@ EXCEL_FILE = os.path.join(BASE_FOLDER, EXCEL_FILENAME)
 DRAWINGS_FOLDER = os.path.join(BASE_FOLDER, "crtezi")
 BACKUP_FOLDER = config.get("BACKUP_FOLDER", os.path.join(".", "backup"))
 
+# Storage backend: "excel" (default) or "sqlite"
+STORAGE = config.get("STORAGE", "excel").lower()
+DB_FILENAME = config.get("DB_FILENAME", "BAZACRTEZA.db")
+DB_FILE = os.path.join(BASE_FOLDER, DB_FILENAME)
+
+# Excel edits are logged to the journal and written to the Excel file when idle
+JOURNAL_FILE = EXCEL_FILE + ".journal"
+COMPACT_DELAY = float(config.get("COMPACT_DELAY", "5"))
+
+# Search in worker processes from this many records on (0 = off). Off by
+# default: turn it on only where bench_shards.py shows the processes are faster
+PARALLEL_MIN_ROWS = int(config.get("PARALLEL_MIN_ROWS", "0"))
+
+# Drawing thumbnails for the preview, kept between runs
+THUMB_FOLDER = config.get("THUMB_FOLDER", os.path.join(".", "miniature"))
+
+# Drawings warmed on each side of the shown one (0 = off), most MB read for them at a time
+PREFETCH_DRAWINGS = int(config.get("PREFETCH_DRAWINGS", "3"))
+PREFETCH_MB = float(config.get("PREFETCH_MB", "64"))
+
 FIELDS = [
     "IDENTBROJ", "CRTEZBROJ", "NAZIVDELA", "TEHNPODACI",
     "KATALBROJ", "FORMAT", "ARHIVA", "KOMENTAR",
@@ -73,8 +102,8 @@ def load_excel_data(filename):
     except Exception as e:
         return [], f"Greška pri učitavanju {filename}: {str(e)}"
 
-def save_excel_data(filename, data, fields):
-    """Save data to Excel using openpyxl"""
+def write_excel_data(filename, data, fields):
+    """Write all records to a new Excel file using openpyxl"""
     try:
         wb = Workbook()
         ws = wb.active
@@ -101,7 +130,109 @@ def save_excel_data(filename, data, fields):
     except Exception as e:
         return False, f"Greška: {str(e)}"
 
-data, error = load_excel_data(EXCEL_FILE)
+def save_excel_data(filename, fields, changes):
+    """Patch changed data rows in Excel file in a single load/save cycle
+
+    changes is a list of (index, record) pairs applied in order,
+    record None deletes the row.
+    """
+    try:
+        try:
+            wb = load_workbook(filename)
+            ws = wb.active
+        except FileNotFoundError:
+            # Nothing to patch yet - start a new file
+            wb = Workbook()
+            ws = wb.active
+            for col, field in enumerate(fields, start=1):
+                ws.cell(row=1, column=col, value=field)
+        
+        # Map fields to existing columns, add missing ones at the end
+        headers = [cell.value for cell in ws[1]]
+        for field in fields:
+            if field not in headers:
+                headers.append(field)
+                ws.cell(row=1, column=len(headers), value=field)
+        
+        for idx, record in changes:
+            row_idx = idx + 2  # Row 1 holds headers
+            if record is None:
+                ws.delete_rows(row_idx)
+                continue
+            for field in fields:
+                col_idx = headers.index(field) + 1
+                ws.cell(row=row_idx, column=col_idx, value=record.get(field))
+        
+        wb.save(filename)
+        wb.close()
+        return True, None
+    except PermissionError:
+        return False, (
+            f"Ne mogu da sačuvam '{filename}'!\n\n"
+            f"Fajl je verovatno otvoren u Excel programu.\n"
+            f"Molim vas zatvorite fajl u Excel-u i pokušajte ponovo."
+        )
+    except Exception as e:
+        return False, f"Greška: {str(e)}"
+
+def journal_changes(entries):
+    """Convert journal entries to (index, record) changes for save_excel_data"""
+    return [
+        (entry["idx"], entry["record"] if entry["op"] == "save" else None)
+        for entry in entries
+    ]
+
+journal = EditJournal(JOURNAL_FILE, FIELDS)
+journal_warning = None  # Journal entries that did not fit the Excel file
+
+def load_data():
+    """Load data from configured storage backend"""
+    global journal_warning
+    if STORAGE != "sqlite":
+        data, error = load_excel_data(EXCEL_FILE)
+        # Replay edits that were not written to the Excel file yet
+        if not error:
+            _, journal_warning = journal.replay(data)
+        return data, error
+    
+    # First start with SQLite - import existing Excel file
+    if not os.path.exists(DB_FILE) and os.path.exists(EXCEL_FILE):
+        excel_data, error = load_excel_data(EXCEL_FILE)
+        if error:
+            return [], error
+        success, error = replace_sqlite_data(DB_FILE, excel_data, FIELDS)
+        if not success:
+            return [], error
+    
+    return load_sqlite_data(DB_FILE, FIELDS)
+
+def save_data_record(idx, before, rec):
+    """Persist a new or changed record to configured storage backend"""
+    if STORAGE == "sqlite":
+        return save_sqlite_record(DB_FILE, rec, FIELDS)
+    success, error_msg = journal.append_save(idx, before, rec)
+    if success:
+        compactor.schedule()
+    return success, error_msg
+
+def delete_data_record(idx, rec):
+    """Remove a record (already removed from data) from configured storage backend"""
+    if STORAGE == "sqlite":
+        return delete_sqlite_record(DB_FILE, rec)
+    success, error_msg = journal.append_delete(idx, rec)
+    if success:
+        compactor.schedule()
+    return success, error_msg
+
+data, error = load_data()
+data = RecordStore(FIELDS, data)
+search_cache = SearchCache(data)
+search_cache.start_index(FIELDS)  # Trigram index is built in the background
+sharded_search = ShardedSearch(data, FIELDS, PARALLEL_MIN_ROWS)  # Only for large registers
+# Drawing previews are made on a thread pool
+thumbnails = ThumbnailCache(THUMB_FOLDER, prefetch_bytes=int(PREFETCH_MB * 1024 * 1024))
+drawing_index = DrawingIndex(DRAWINGS_FOLDER)
+drawing_index.start()  # The drawings folder is read once in the background
 
 current_index = None
 search_results = []
@@ -121,6 +252,9 @@ if error:
         exit()
     root.deiconify()
 
+if journal_warning:
+    messagebox.showwarning("Dnevnik izmena", journal_warning)
+
 record_number_var = tk.StringVar()
 
 # --- Fonts ---
@@ -154,6 +288,7 @@ search_frame = ttk.Frame(root, relief="flat", borderwidth=1)
 search_frame.pack(fill=tk.X, padx=10, pady=5)
 
 search_field_var = tk.StringVar(value="CRTEZBROJ")
+search_mode_var = tk.StringVar(value="Sadrži")
 search_value_var = tk.StringVar()
 
 inner_frame = ttk.Frame(search_frame)
@@ -163,17 +298,14 @@ ttk.Label(inner_frame, text="Traži u:").pack(side=tk.LEFT, padx=0)
 search_field_menu = ttk.Combobox(inner_frame, textvariable=search_field_var, 
                                   values=FIELDS, width=15, state="readonly")
 search_field_menu.pack(side=tk.LEFT, padx=5)
+search_mode_menu = ttk.Combobox(inner_frame, textvariable=search_mode_var,
+                                values=list(SEARCH_MODES), width=10, state="readonly")
+search_mode_menu.pack(side=tk.LEFT, padx=5)
 ttk.Label(inner_frame, text="Vrednost:").pack(side=tk.LEFT, padx=(15, 0))
 search_value_entry = ttk.Entry(inner_frame, textvariable=search_value_var, 
                                width=30, justify='center')
 search_value_entry.pack(side=tk.LEFT, padx=0, pady=5, ipadx=5, ipady=8)
 
-def normalize(s):
-    """Normalize string for comparison"""
-    if not s:
-        return ""
-    return re.sub(r"\W+", "", str(s).lower())
-
 def load_record(idx):
     """Load record at given index into UI"""
     global current_index
@@ -190,45 +322,172 @@ def load_record(idx):
     
     current_index = idx
     record_number_var.set(f"{idx + 1}/{len(data)}")
+    record_table.show(idx)
+    drawing_preview.show(drawing_index.path(rec.get("CRTEZBROJ")))
+    prefetch_drawings(idx)
+
+def prefetch_drawings(idx):
+    """Warm the drawings around idx, in search result order while going through the results"""
+    if 0 <= search_index < len(search_results) and search_results[search_index] == idx:
+        nearby = neighbours(search_results, search_index, PREFETCH_DRAWINGS)
+    else:
+        nearby = neighbours(range(len(data)), idx, PREFETCH_DRAWINGS)
+    thumbnails.prefetch([drawing_index.path(data[i].get("CRTEZBROJ")) for i in nearby])
 
 search_counter_var = tk.StringVar(value="")
 
+def run_query(terms, cancelled=None):
+    """Search in the worker processes if they are running, here otherwise"""
+    results = sharded_search.query(terms)
+    if results is None:
+        results = search_cache.query(terms, cancelled)
+    return results
+
 def do_search():
     """Perform search in selected field"""
     global search_results, search_index
     
-    key = search_field_var.get()
-    val = normalize(search_value_var.get().strip())
-    
-    if not val:
+    text = search_value_var.get().strip()
+    if not text:
         messagebox.showinfo("Pretraga", "Unesite vrednost za pretragu!")
         return
     
-    search_results = [
-        i for i, rec in enumerate(data)
-        if val in normalize(rec.get(key))
-    ]
+    # "FORMAT=A3 NAZIVDELA~vijak" searches several fields at once
+    terms, error = parse_query(text, FIELDS, search_field_var.get(), SEARCH_MODES[search_mode_var.get()])
+    if error:
+        messagebox.showerror("Pretraga", error)
+        return
+    
+    cancel_live_search()
+    last = live_search["last"]
+    if last and (last["terms"], last["version"]) == (terms, search_cache.version):
+        # Already found while typing
+        search_results = last["results"]
+        search_cache.remember(terms, search_results)
+    else:
+        search_results = run_query(terms)
     
+    results_panel.set_results(search_results)
     if search_results:
-        search_index = 0
-        load_record(search_results[search_index])
-        search_counter_var.set(f"{search_index + 1}/{len(search_results)}")
+        show_result(0)
     else:
         search_index = 0
         search_counter_var.set("")
         messagebox.showinfo("Pretraga", "Ništa nije pronađeno!")
 
+def show_result(n):
+    """Load search result n and select it in the results panel"""
+    global search_index
+    search_index = n
+    load_record(search_results[n])
+    search_counter_var.set(f"{n + 1}/{result_count(search_results)}")
+    results_panel.show(n)
+
 def next_result():
     """Navigate to next search result"""
-    global search_index
     if not search_results:
         return
-    search_index = (search_index + 1) % len(search_results)
-    load_record(search_results[search_index])
-    search_counter_var.set(f"{search_index + 1}/{len(search_results)}")
+    # Past the last loaded hit of a ranked search, load its next page first
+    if search_index == len(search_results) - 1 and getattr(search_results, "more", False):
+        load_more_results()
+    show_result((search_index + 1) % len(search_results))
+
+def load_more_results():
+    """Next page of a ranked search, when the results panel is scrolled to its end"""
+    global search_results
+    results = sharded_search.next_page(search_results)
+    if results is None:
+        results = search_cache.next_page(search_results)
+    search_results = results
+    results_panel.more_results(search_results)
+    search_counter_var.set(f"{search_index + 1}/{result_count(search_results)}")
+
+# --- Search as you type ---
+LIVE_SEARCH_DELAY_MS = 250  # Wait for a pause in typing before searching
+
+search_worker = BackgroundWorker(root, poll_ms=30)
+live_search = {"after": None, "generation": 0, "last": None}
+
+def schedule_live_search(*args):
+    """Restart the delay on every keystroke or field/mode change"""
+    if live_search["after"] is not None:
+        root.after_cancel(live_search["after"])
+    live_search["after"] = root.after(LIVE_SEARCH_DELAY_MS, start_live_search)
+
+def cancel_live_search():
+    """Drop the pending and the running live search"""
+    if live_search["after"] is not None:
+        root.after_cancel(live_search["after"])
+        live_search["after"] = None
+    live_search["generation"] += 1
+
+def start_live_search():
+    """Run the typed query on the search worker, refine the previous results if possible"""
+    cancel_live_search()
+    generation = live_search["generation"]
+    text = search_value_var.get().strip()
+    terms, error = parse_query(text, FIELDS, search_field_var.get(), SEARCH_MODES[search_mode_var.get()])
+    if not text or error:
+        # Nothing typed yet, or an unfinished query
+        live_search["last"] = None
+        search_counter_var.set("")
+        return
+    
+    search_cache.prepare(terms)
+    version = search_cache.version
+    last = live_search["last"]
+    
+    def cancelled():
+        return generation != live_search["generation"]
+    
+    def job():
+        results = None
+        if last and last["version"] == version:
+            results = search_cache.refine(last["terms"], last["results"], terms, cancelled)
+        if results is None:
+            results = run_query(terms, cancelled)
+        return results, None
+    
+    def done(results, error):
+        global search_results, search_index
+        if cancelled():
+            return
+        if search_cache.version != version:
+            # Records were edited while searching
+            start_live_search()
+            return
+        if error or results is None:
+            return
+        live_search["last"] = {"terms": terms, "version": version, "results": results}
+        # Show the count only, Enter or "Sledeći" goes to the first hit
+        search_results = results
+        search_index = -1
+        search_counter_var.set(f"0/{result_count(results)}")
+        results_panel.set_results(results)
+    
+    cached = search_cache.cached(terms)
+    if cached is not None:
+        done(cached, None)
+    else:
+        search_worker.submit("search", job, done)
+
+def show_search_stats():
+    """Query result cache counters (F12)"""
+    stats = search_cache.stats
+    messagebox.showinfo(
+        "Statistika pretrage",
+        f"Pogoci u kešu: {stats['hits']}\n"
+        f"Promašaji: {stats['misses']}\n"
+        f"Ažurirano posle izmena: {stats['patched']}\n"
+        f"Odbačeno: {stats['dropped']}"
+    )
 
 # Bind Enter key to search
 search_value_entry.bind('<Return>', lambda e: do_search())
+search_value_var.trace_add("write", schedule_live_search)
+search_field_menu.bind("<<ComboboxSelected>>", schedule_live_search)
+search_mode_menu.bind("<<ComboboxSelected>>", schedule_live_search)
+root.bind("<F12>", lambda e: show_search_stats())
 
 ttk.Button(inner_frame, text="Traži", command=do_search).pack(side=tk.LEFT, padx=(15, 5))
 ttk.Button(inner_frame, text="Sledeći", command=next_result).pack(side=tk.LEFT, padx=5)
@@ -239,6 +498,18 @@ ttk.Label(inner_frame, textvariable=search_counter_var, width=8,
 record_frame = ttk.Frame(root, padding=(10, 10), relief="flat", borderwidth=1)
 record_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=0)
 
+# --- Side column: drawing preview and search results ---
+side_frame = ttk.Frame(root)
+side_frame.pack(before=record_frame, side=tk.RIGHT, fill=tk.Y, padx=(0, 10))
+
+# Click on the preview opens the drawing in the external viewer
+drawing_preview = DrawingPreview(side_frame, thumbnails, on_click=lambda: open_drawing())
+drawing_preview.frame.pack(side=tk.TOP, pady=(0, 10))
+
+# Search results are shown while there are any
+results_panel = ResultsPanel(side_frame, data, show_result, on_end=load_more_results,
+                             side=tk.TOP, fill=tk.BOTH, expand=True)
+
 entries = {}
 
 def make_entry(parent, label_text, field_name, width=30, ipady=0):
@@ -279,11 +550,12 @@ def open_drawing():
         messagebox.showinfo("Otvori crtež", "Broj crteža nije specificiran!")
         return
     
-    # Clean filename
-    filename = crtez.replace("/", "-").replace("\\", "-") + ".jpg"
-    path = os.path.join(DRAWINGS_FOLDER, filename)
+    # Clean filename, looked up in the index of the drawings folder
+    filename = drawing_file(crtez)
+    path = drawing_index.path(crtez)
     
-    if os.path.exists(path):
+    # Unchecked until the drawings folder has been read
+    if path and (drawing_index.ready or os.path.exists(path)):
         try:
             webbrowser.open(os.path.abspath(path))
         except Exception as e:
@@ -336,6 +608,8 @@ def add_record():
     
     record_number_var.set(f"{current_index + 1}/{len(data) + 1}")
     search_results = []
+    results_panel.set_results([])
+    drawing_preview.show(None)
 
 def save_record():
     """Save current record to data and Excel file"""
@@ -345,39 +619,60 @@ def save_record():
         return
     
     # Determine if this is a new record or existing
-    if current_index >= len(data):
-        # New record at the end
-        rec = {}
-        data.append(rec)
-    else:
-        # Existing record
-        rec = data[current_index]
+    is_new = current_index >= len(data)
+    rec = {} if is_new else data[current_index]
+    values = {}
     
     # Handle IDENTBROJ specially (must be integer or None)
     ident_str = entries["IDENTBROJ"].get().strip()
     if ident_str == "":
-        rec["IDENTBROJ"] = None
+        values["IDENTBROJ"] = None
     else:
         try:
-            rec["IDENTBROJ"] = int(ident_str)
+            values["IDENTBROJ"] = int(ident_str)
         except ValueError:
             messagebox.showerror("Greška", "ID Broj mora biti broj!")
             return
 
-    # Save all other fields
+    # Collect all other fields
     for f in FIELDS:
         if f == "IDENTBROJ":
             continue
         val = entries[f].get().strip()
-        rec[f] = None if val == "" else val
+        values[f] = None if val == "" else val
+
+    # Skip the write if nothing changed (compare as displayed in the form)
+    if not is_new and all(
+        ("" if rec.get(f) is None else str(rec.get(f))) ==
+        ("" if values[f] is None else str(values[f]))
+        for f in FIELDS
+    ):
+        set_save_status("unchanged")
+        return
+
+    before = None if is_new else rec.copy()
+    rec.update(values)
+    if is_new:
+        # New record at the end
+        data.append(rec)
+        rec = data[current_index]
+        search_cache.insert(current_index)
+        sharded_search.insert(current_index)
+    else:
+        search_cache.update(current_index)
+        sharded_search.update(current_index)
 
-    # Save to Excel
-    success, error_msg = save_excel_data(EXCEL_FILE, data, FIELDS)
+    # Save to storage
+    success, error_msg = save_data_record(current_index, before, rec)
     
     if success:
-        messagebox.showinfo("Sačuvaj", "Unos sačuvan!")
+        if STORAGE == "sqlite":
+            set_save_status("saved")
         # Update display
         record_number_var.set(f"{current_index + 1}/{len(data)}")
+        record_table.show(current_index)
+        results_panel.refresh()
+        drawing_preview.show(drawing_index.path(rec.get("CRTEZBROJ")))
     else:
         messagebox.showerror("Greška - Fajl je zaključan", error_msg)
 
@@ -401,45 +696,63 @@ def delete_record():
     # Save the record in case we need to restore it
     rec = data[current_index].copy()
     del data[current_index]
+    search_cache.delete(current_index)
+    sharded_search.delete(current_index)
     
-    # Save to Excel
-    success, error_msg = save_excel_data(EXCEL_FILE, data, FIELDS)
+    # Save to storage
+    success, error_msg = delete_data_record(current_index, rec)
     
     if not success:
         # Restore the deleted record if save failed
         data.insert(current_index, rec)
+        search_cache.insert(current_index)
+        sharded_search.insert(current_index)
         messagebox.showerror("Greška - Fajl je zaključan", error_msg)
         return
     
-    messagebox.showinfo("Brisanje", "Unos izbrisan!")
+    if STORAGE == "sqlite":
+        set_save_status("saved")
 
     # Reset current index and display
     search_results = []  # Clear search results
+    results_panel.set_results([])
     
     if len(data) == 0:
         current_index = None
         for e in entries.values():
             e.delete(0, tk.END)
         record_number_var.set("0/0")
+        drawing_preview.show(None)
+        record_table.refresh()
     else:
         if current_index >= len(data):
             current_index = len(data) - 1
         load_record(current_index)
 
 def make_backup():
-    """Create a backup copy of the Excel file with timestamp"""
+    """Create a backup copy of the storage file with timestamp"""
+    # Make sure the Excel file contains all journaled edits
+    if STORAGE != "sqlite":
+        success, error_msg = compactor.flush()
+        if not success:
+            messagebox.showerror("Greška - Fajl je zaključan", error_msg)
+            return
+        set_save_status("saved")
+
     try:
         # Create backup folder if it doesn't exist
         if not os.path.exists(BACKUP_FOLDER):
             os.makedirs(BACKUP_FOLDER)
         
         # Generate filename with timestamp
+        source = DB_FILE if STORAGE == "sqlite" else EXCEL_FILE
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        backup_filename = f"BAZACRTEZA_{timestamp}.xlsx"
+        extension = os.path.splitext(source)[1]
+        backup_filename = f"BAZACRTEZA_{timestamp}{extension}"
         backup_path = os.path.join(BACKUP_FOLDER, backup_filename)
         
         # Copy the file
-        shutil.copy2(EXCEL_FILE, backup_path)
+        shutil.copy2(source, backup_path)
         
         messagebox.showinfo("Rezervna kopija", 
                           f"Rezervna kopija je uspešno kreirana!\n\n{backup_filename}")
@@ -460,6 +773,63 @@ delete_button.pack(pady=5, fill=tk.X, ipadx=10)
 backup_button = ttk.Button(right_frame, text="Napravi rezervnu kopiju", command=make_backup)
 backup_button.pack(pady=5, fill=tk.X, ipadx=10)
 
+def export_to_excel():
+    """Export all records from SQLite database to Excel file"""
+    snapshot = data.to_records()
+    
+    def export_done(success, error_msg):
+        if success:
+            messagebox.showinfo("Izvoz", f"Podaci su izvezeni u '{EXCEL_FILE}'!")
+        else:
+            messagebox.showerror("Greška - Fajl je zaključan", error_msg)
+    
+    save_worker.submit("export", lambda: write_excel_data(EXCEL_FILE, snapshot, FIELDS),
+                       export_done)
+
+def import_from_excel():
+    """Replace SQLite database content with records from Excel file"""
+    global data, current_index, search_results
+    
+    confirm = messagebox.askyesno(
+        "Uvoz",
+        f"Svi unosi u bazi biće zamenjeni podacima iz '{EXCEL_FILE}'.\n\nDa li ste sigurni?"
+    )
+    if not confirm:
+        return
+    
+    new_data, error_msg = load_excel_data(EXCEL_FILE)
+    if error_msg:
+        messagebox.showerror("Greška", error_msg)
+        return
+    
+    success, error_msg = replace_sqlite_data(DB_FILE, new_data, FIELDS)
+    if not success:
+        messagebox.showerror("Greška", error_msg)
+        return
+    
+    data = RecordStore(FIELDS, new_data)
+    search_cache.reset(data)
+    sharded_search.reset(data)
+    record_table.reset(data)
+    results_panel.reset(data)
+    search_results = []
+    if data:
+        load_record(0)
+    else:
+        current_index = None
+        for e in entries.values():
+            e.delete(0, tk.END)
+        record_number_var.set("0/0")
+        drawing_preview.show(None)
+    messagebox.showinfo("Uvoz", f"Uvezeno unosa: {len(data)}")
+
+if STORAGE == "sqlite":
+    export_button = ttk.Button(right_frame, text="Izvezi u Excel", command=export_to_excel)
+    export_button.pack(pady=5, fill=tk.X, ipadx=10)
+    
+    import_button = ttk.Button(right_frame, text="Uvezi iz Excel-a", command=import_from_excel)
+    import_button.pack(pady=5, fill=tk.X, ipadx=10)
+
 # --- Navigation Frame ---
 nav_frame = ttk.Frame(root, padding=15)
 nav_frame.pack(side="bottom", fill=tk.X, padx=10, pady=10)
@@ -476,18 +846,25 @@ def prev_record():
         load_record(current_index - 1)
 
 def goto_record():
-    """Go to specific record number"""
+    """Go to specific record number or drawing number"""
     if not data:
         return
+    text = record_number_entry.get().strip()
     try:
-        idx = int(record_number_entry.get()) - 1
-        if 0 <= idx < len(data):
-            load_record(idx)
-        else:
-            messagebox.showwarning("Greška", 
-                                  f"Unesite broj između 1 i {len(data)}")
+        idx = int(text) - 1
     except ValueError:
-        messagebox.showwarning("Greška", "Unesite validan broj!")
+        # Not a record number - look the drawing number up in the key index
+        matches = search_cache.search("CRTEZBROJ", text, "exact")
+        if matches:
+            load_record(matches[0])
+        else:
+            messagebox.showwarning("Greška", f"Crtež '{text}' nije pronađen!")
+        return
+    if 0 <= idx < len(data):
+        load_record(idx)
+    else:
+        messagebox.showwarning("Greška", 
+                              f"Unesite broj između 1 i {len(data)}")
 
 def next_record_nav():
     """Go to next record"""
@@ -511,10 +888,82 @@ ttk.Button(nav_frame, text="Idi", command=goto_record).pack(side=tk.LEFT, padx=5
 ttk.Button(nav_frame, text="Sledeći >", command=next_record_nav).pack(side=tk.LEFT, padx=5)
 ttk.Button(nav_frame, text="Poslednji >>", command=last_record).pack(side=tk.LEFT, padx=5)
 
+# Table of all records, selecting a row loads it into the form
+record_table = RecordTable(root, data, FIELDS, load_record, title="Tabela crteža")
+ttk.Button(nav_frame, text="Tabela", 
+           command=lambda: record_table.open(current_index)).pack(side=tk.LEFT, padx=(15, 5))
+
+def drawings_report():
+    """Records without a drawing, drawings without a record and misnamed files"""
+    # Read the folder again so the report is up to date
+    success, error_msg = drawing_index.scan()
+    if not success:
+        messagebox.showerror("Greška", error_msg)
+        return
+    report = drawing_index.report(data)
+    show_report(root, "Provera crteža", format_report(report, DRAWINGS_FOLDER))
+
+ttk.Button(nav_frame, text="Provera crteža", command=drawings_report).pack(side=tk.LEFT, padx=5)
+
+# --- Save status ---
+SAVE_STATUS = {
+    "pending": ("Izmene čekaju upis u Excel...", "#a66a00"),
+    "saving": ("Upisivanje u Excel...", "#a66a00"),
+    "saved": ("✓ Sve izmene su sačuvane", "#2e7d32"),
+    "unchanged": ("Nema izmena za čuvanje", "#333333"),
+    "error": ("✗ Greška pri upisu u Excel!", "#c62828"),
+}
+
+save_status_var = tk.StringVar(value="")
+save_status_label = ttk.Label(nav_frame, textvariable=save_status_var, anchor="e")
+save_status_label.pack(side=tk.RIGHT, padx=5)
+
+def set_save_status(state, error_msg=None):
+    """Show save state in the status indicator"""
+    text, color = SAVE_STATUS[state]
+    save_status_var.set(text)
+    save_status_label.configure(foreground=color)
+    if state == "error" and error_msg:
+        messagebox.showwarning(
+            "Upis u Excel",
+            f"{error_msg}\n\nIzmene su sačuvane u dnevniku izmena i biće upisane "
+            f"u Excel fajl pri sledećem čuvanju ili zatvaranju programa."
+        )
+
+# --- Journal compaction ---
+def fold_journal(entries):
+    """Prepare journal entries for writing to the Excel file on the worker thread"""
+    changes = journal_changes(entries)
+    return lambda: save_excel_data(EXCEL_FILE, FIELDS, changes)
+
+save_worker = BackgroundWorker(root)
+compactor = BackgroundCompactor(root, journal, fold_journal, save_worker,
+                                delay_ms=int(COMPACT_DELAY * 1000),
+                                on_status=set_save_status)
+
+def on_close():
+    """Write pending journal entries to the Excel file before closing"""
+    if STORAGE != "sqlite":
+        success, error_msg = compactor.flush()
+        if not success:
+            messagebox.showwarning(
+                "Upis u Excel",
+                f"{error_msg}\n\nIzmene su sačuvane u dnevniku izmena i biće "
+                f"upisane u Excel fajl pri sledećem pokretanju programa."
+            )
+    thumbnails.close()  # Drop queued previews and prefetches
+    root.destroy()
+
+root.protocol("WM_DELETE_WINDOW", on_close)
+
 # --- Initialize ---
 if data:
     load_record(0)
 else:
     record_number_var.set("0/0")
 
+# Write edits replayed from the journal at startup
+if STORAGE != "sqlite" and journal.entries():
+    compactor.schedule()
+
 root.mainloop()
\ No newline at end of file
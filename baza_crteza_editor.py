@@ -1,13 +1,21 @@
 import os
-import re
 import tkinter as tk
 from tkinter import ttk, messagebox
 import tkinter.font as tkFont
 import webbrowser
 import pandas as pd
+from baza_crteza_journal import EditJournal, BackgroundCompactor
+from baza_crteza_saver import BackgroundWorker
+from baza_crteza_frame import FrameSearch
+from baza_crteza_search import SearchCache, parse_query, result_count, SEARCH_MODES
+from baza_crteza_table import RecordTable, ResultsPanel
+from baza_crteza_preview import ThumbnailCache, DrawingPreview, neighbours
+from baza_crteza_drawings import DrawingIndex, drawing_file, format_report, show_report
 
 EXCEL_FILE = "BAZACRTEZA.xlsx"
 DRAWINGS_FOLDER = "crtezi"
+THUMB_FOLDER = "miniature"  # Drawing thumbnails for the preview
+JOURNAL_FILE = EXCEL_FILE + ".journal"
 
 FIELDS = [
     "IDENTBROJ", "CRTEZBROJ", "NAZIVDELA", "TEHNPODACI",
@@ -31,6 +39,18 @@ except Exception as e:
     data = []
     df = pd.DataFrame(columns=FIELDS)
 
+# Replay edits that were not written to the Excel file yet
+journal = EditJournal(JOURNAL_FILE, FIELDS)
+applied, journal_warning = journal.replay(data)
+if applied:
+    df = pd.DataFrame(data)
+search_cache = SearchCache(data)
+search_cache.start_index(FIELDS)  # Trigram index is built in the background
+thumbnails = ThumbnailCache(THUMB_FOLDER)  # Drawing previews are made on a thread pool
+drawing_index = DrawingIndex(DRAWINGS_FOLDER)
+drawing_index.start()  # The drawings folder is read once in the background
+frame_search = FrameSearch(df, FIELDS)  # Vectorized search over normalized df columns
+
 current_index = None
 search_results = []
 search_index = 0
@@ -41,6 +61,9 @@ root = tk.Tk()
 root.title("Baza Crteza Pomoćne mehanizacije - Editor")
 root.geometry("1400x800")
 
+if journal_warning:
+    messagebox.showwarning("Dnevnik izmena", journal_warning)
+
 record_number_var = tk.StringVar()
 
 # Fonts and styles
@@ -57,6 +80,7 @@ search_frame = ttk.Frame(root, padding=10, relief="solid", borderwidth=1)
 search_frame.pack(fill=tk.X, padx=10, pady=10)
 
 search_field_var = tk.StringVar(value="CRTEZBROJ")
+search_mode_var = tk.StringVar(value="Sadrži")
 search_value_var = tk.StringVar()
 
 inner_frame = ttk.Frame(search_frame)
@@ -65,15 +89,12 @@ inner_frame.pack()
 ttk.Label(inner_frame, text="Traži u:").pack(side=tk.LEFT, padx=5)
 search_field_menu = ttk.Combobox(inner_frame, textvariable=search_field_var, values=FIELDS, width=15)
 search_field_menu.pack(side=tk.LEFT, padx=5)
+search_mode_menu = ttk.Combobox(inner_frame, textvariable=search_mode_var, values=list(SEARCH_MODES), width=10, state="readonly")
+search_mode_menu.pack(side=tk.LEFT, padx=5)
 ttk.Label(inner_frame, text="Vrednost:").pack(side=tk.LEFT, padx=5)
 search_value_entry = ttk.Entry(inner_frame, textvariable=search_value_var, width=30, justify='center')
 search_value_entry.pack(side=tk.LEFT, padx=5, pady=5, ipadx=5, ipady=8)
 
-def normalize(s):
-    if not s:
-        return ""
-    return re.sub(r"\W+", "", str(s).lower())
-
 def load_record(idx):
     global current_index
     if not data:
@@ -87,52 +108,76 @@ def load_record(idx):
             entry.insert(0, "" if val is None else str(val))
     current_index = idx
     record_number_var.set(f"{idx+1}/{len(data)}")
+    record_table.show(idx)
+    drawing_preview.show(drawing_index.path(rec.get("CRTEZBROJ")))
+    prefetch_drawings(idx)
+
+def prefetch_drawings(idx):
+    # Warm the drawings around idx, in search result order while going through the results
+    if 0 <= search_index < len(search_results) and search_results[search_index] == idx:
+        nearby = neighbours(search_results, search_index)
+    else:
+        nearby = neighbours(range(len(data)), idx)
+    thumbnails.prefetch([drawing_index.path(data[i].get("CRTEZBROJ")) for i in nearby])
 
-def save_to_excel():
+def save_to_excel(frame):
     """Helper function to save DataFrame to Excel with error handling"""
     try:
-        df.to_excel(EXCEL_FILE, index=False)
-        return True
+        frame.to_excel(EXCEL_FILE, index=False)
+        return True, None
     except PermissionError:
-        messagebox.showerror(
-            "Greška - Fajl je zaključan", 
+        return False, (
             f"Ne mogu da sačuvam '{EXCEL_FILE}'!\n\n"
             f"Fajl je verovatno otvoren u Excel programu.\n"
             f"Molim vas zatvorite fajl u Excel-u i pokušajte ponovo."
         )
-        return False
     except Exception as e:
-        messagebox.showerror("Greška pri čuvanju", f"Greška: {str(e)}")
-        return False
+        return False, f"Greška: {str(e)}"
 
 search_counter_var = tk.StringVar(value="")
 
 def do_search():
     global search_results, search_index
-    key = search_field_var.get()
-    val = re.sub(r"\W+", "", search_value_var.get().strip().lower())
-    search_results = [
-        i for i, rec in enumerate(data)
-        if val in normalize(rec.get(key))
-    ]
+    # "FORMAT=A3 NAZIVDELA~vijak" searches several fields at once
+    terms, error = parse_query(search_value_var.get().strip(), FIELDS, search_field_var.get(),
+                               SEARCH_MODES[search_mode_var.get()])
+    if error:
+        messagebox.showerror("Pretraga", error)
+        return
+    search_results = frame_search.query(terms)
+    if search_results is None:
+        # Fuzzy search is not vectorized
+        search_results = search_cache.query(terms)
+    results_panel.set_results(search_results)
     if search_results:
-        search_index = 0
-        load_record(search_results[search_index])
-        search_counter_var.set(f"{search_index+1}/{len(search_results)}")
+        show_result(0)
     else:
         search_index = 0
         search_counter_var.set("")
         messagebox.showinfo("Pretraga", "Ništa nije pronađeno!")
 
-def next_result():
+def show_result(n):
+    # Load search result n and select it in the results panel
     global search_index
+    search_index = n
+    load_record(search_results[n])
+    search_counter_var.set(f"{n+1}/{result_count(search_results)}")
+    results_panel.show(n)
+
+def next_result():
     if not search_results:
         return
-    search_index += 1
-    if search_index >= len(search_results):
-        search_index = 0
-    load_record(search_results[search_index])
-    search_counter_var.set(f"{search_index+1}/{len(search_results)}")
+    # Past the last loaded hit of a ranked search, load its next page first
+    if search_index == len(search_results) - 1 and getattr(search_results, "more", False):
+        load_more_results()
+    show_result((search_index + 1) % len(search_results))
+
+def load_more_results():
+    # Next page of a ranked search, when the results panel is scrolled to its end
+    global search_results
+    search_results = frame_search.next_page(search_results)
+    results_panel.more_results(search_results)
+    search_counter_var.set(f"{search_index+1}/{result_count(search_results)}")
 
 ttk.Button(inner_frame, text="Traži", command=do_search).pack(side=tk.LEFT, padx=5)
 ttk.Button(inner_frame, text="Sledeći", command=next_result).pack(side=tk.LEFT, padx=5)
@@ -144,6 +189,18 @@ ttk.Label(inner_frame, textvariable=search_counter_var, width=8, anchor="center"
 record_frame = ttk.Frame(root, padding=20)
 record_frame.pack(fill=tk.BOTH, expand=True)
 
+# --- Side column: drawing preview and search results ---
+side_frame = ttk.Frame(root)
+side_frame.pack(before=record_frame, side=tk.RIGHT, fill=tk.Y, padx=(0,10))
+
+# Click on the preview opens the drawing in the external viewer
+drawing_preview = DrawingPreview(side_frame, thumbnails, on_click=lambda: open_drawing())
+drawing_preview.frame.pack(side=tk.TOP, pady=(0, 10))
+
+# Search results are shown while there are any
+results_panel = ResultsPanel(side_frame, data, show_result, on_end=load_more_results,
+                             side=tk.TOP, fill=tk.BOTH, expand=True)
+
 entries = {}
 
 def make_entry(parent, label_text, field_name, width=30):
@@ -181,12 +238,13 @@ def open_drawing():
     crtez = entries["CRTEZBROJ"].get().strip()
     if not crtez:
         return
-    filename = crtez.replace("/", "-").replace("\\", "-") + ".jpg"
-    path = os.path.join(DRAWINGS_FOLDER, filename)
-    if os.path.exists(path):
+    path = drawing_index.path(crtez)
+    # Unchecked until the drawings folder has been read
+    if path and (drawing_index.ready or os.path.exists(path)):
         webbrowser.open(path)
     else:
-        messagebox.showinfo("Otvori crtež", f"Fajl nije pronađen: {path}")
+        messagebox.showinfo("Otvori crtež",
+                            f"Fajl nije pronađen: {os.path.join(DRAWINGS_FOLDER, drawing_file(crtez))}")
 
 open_btn = ttk.Button(id_crtez_frame, text="Otvori Crtež")
 open_btn.pack(side=tk.LEFT)
@@ -233,9 +291,11 @@ def add_record():
     
     record_number_var.set(f"{current_index+1}/{len(data)+1}")
     search_results = []
+    results_panel.set_results([])
+    drawing_preview.show(None)
 
 def save_record():
-    global current_index, data, df
+    global current_index, data
 
     if current_index is None:
         return
@@ -243,10 +303,11 @@ def save_record():
     if current_index >= len(data):
         # New record at the end
         rec = {}
-        data.append(rec)
+        before = None
     else:
         # Existing record
         rec = data[current_index]
+        before = rec.copy()
     
     ident_str = entries["IDENTBROJ"].get().strip()
     if ident_str == "":
@@ -264,13 +325,26 @@ def save_record():
         val = entries[f].get().strip()
         rec[f] = None if val == "" else val
 
-    # Convert data back to DataFrame and save to Excel
-    df = pd.DataFrame(data)
-    if save_to_excel():
-        messagebox.showinfo("Sačuvaj", "Unos sačuvan!")
+    if before is None:
+        data.append(rec)
+        search_cache.insert(current_index)
+        frame_search.insert(current_index, rec)
+    else:
+        search_cache.update(current_index)
+        frame_search.update(current_index, rec)
+    record_table.show(current_index)
+    results_panel.refresh()
+    drawing_preview.show(drawing_index.path(rec.get("CRTEZBROJ")))
+
+    # Log the change, the Excel file is written in the background
+    success, error_msg = journal.append_save(current_index, before, rec)
+    if success:
+        compactor.schedule()
+    else:
+        messagebox.showerror("Greška pri čuvanju", error_msg)
 
 def delete_record():
-    global current_index, search_results, data, df
+    global current_index, search_results, data
     if not data or current_index is None:
         return
     
@@ -287,15 +361,19 @@ def delete_record():
     # Remove from data
     rec = data[current_index].copy()
     del data[current_index]
+    search_cache.delete(current_index)
+    frame_search.delete(current_index)
     
-    # Convert data back to DataFrame and save to Excel
-    df = pd.DataFrame(data)
-    if not save_to_excel():
+    # Log the change, the Excel file is written in the background
+    success, error_msg = journal.append_delete(current_index, rec)
+    if not success:
         # Restore the deleted record if save failed
         data.insert(current_index, rec)
+        search_cache.insert(current_index)
+        frame_search.insert(current_index, rec)
+        messagebox.showerror("Greška pri čuvanju", error_msg)
         return
-    
-    messagebox.showinfo("Brisanje", "Unos izbrisan!")
+    compactor.schedule()
 
     # Reset current index
     if len(data) == 0:
@@ -303,12 +381,15 @@ def delete_record():
         for e in entries.values():
             e.delete(0, tk.END)
         record_number_var.set("0/0")
+        drawing_preview.show(None)
+        record_table.refresh()
     else:
         if current_index >= len(data):
             current_index = len(data) - 1
         load_record(current_index)
 
     search_results = []  # clear search results
+    results_panel.set_results([])
    
 save_button = ttk.Button(right_frame, text="Sačuvaj Unos")
 save_button.pack(pady=5, fill=tk.X)
@@ -343,13 +424,18 @@ def goto_record():
     global current_index
     if not data:
         return
+    text = record_number_entry.get().strip()
     try:
-        idx = int(record_number_entry.get()) - 1
-        if 0 <= idx < len(data):
-            current_index = idx
-            load_record(current_index)
+        idx = int(text) - 1
     except ValueError:
-        pass
+        # Not a record number - try it as a drawing number
+        matches = search_cache.search("CRTEZBROJ", text, "exact")
+        if matches:
+            load_record(matches[0])
+        return
+    if 0 <= idx < len(data):
+        current_index = idx
+        load_record(current_index)
 
 def next_record_nav():
     global current_index
@@ -376,6 +462,74 @@ ttk.Button(nav_frame, text="Idi", command=goto_record).pack(side=tk.LEFT, padx=5
 ttk.Button(nav_frame, text="Sledeći >>", command=next_record_nav).pack(side=tk.LEFT, padx=5)
 ttk.Button(nav_frame, text="Poslednji >>", command=last_record).pack(side=tk.LEFT, padx=5)
 
+# Table of all records, selecting a row loads it into the form
+record_table = RecordTable(root, data, FIELDS, load_record, title="Tabela crteža")
+ttk.Button(nav_frame, text="Tabela", command=lambda: record_table.open(current_index)).pack(side=tk.LEFT, padx=(15,5))
+
+def drawings_report():
+    # Records without a drawing, drawings without a record and misnamed files
+    # Read the folder again so the report is up to date
+    success, error_msg = drawing_index.scan()
+    if not success:
+        messagebox.showerror("Greška", error_msg)
+        return
+    report = drawing_index.report(data)
+    show_report(root, "Provera crteža", format_report(report, DRAWINGS_FOLDER))
+
+ttk.Button(nav_frame, text="Provera crteža", command=drawings_report).pack(side=tk.LEFT, padx=5)
+
+
+# --- Save status ---
+SAVE_STATUS = {
+    "pending": ("Izmene čekaju upis u Excel...", "#a66a00"),
+    "saving": ("Upisivanje u Excel...", "#a66a00"),
+    "saved": ("Sve izmene su sačuvane", "#2e7d32"),
+    "error": ("Greška pri upisu u Excel!", "#c62828"),
+}
+
+save_status_var = tk.StringVar(value="")
+save_status_label = ttk.Label(nav_frame, textvariable=save_status_var, anchor="e")
+save_status_label.pack(side=tk.RIGHT, padx=5)
+
+def set_save_status(state, error_msg=None):
+    text, color = SAVE_STATUS[state]
+    save_status_var.set(text)
+    save_status_label.configure(foreground=color)
+    if state == "error" and error_msg:
+        messagebox.showwarning(
+            "Upis u Excel",
+            f"{error_msg}\n\nIzmene su sačuvane u dnevniku izmena i biće upisane "
+            f"u Excel fajl pri sledećem čuvanju ili zatvaranju programa."
+        )
+
+# --- Journal compaction ---
+def fold_journal(entries):
+    # Snapshot on the Tk thread, write on the worker thread
+    global df
+    df = pd.DataFrame(data)
+    frame = df
+    return lambda: save_to_excel(frame)
+
+save_worker = BackgroundWorker(root)
+compactor = BackgroundCompactor(root, journal, fold_journal, save_worker,
+                                on_status=set_save_status)
+
+def on_close():
+    success, error_msg = compactor.flush()
+    if not success:
+        messagebox.showwarning(
+            "Upis u Excel",
+            f"{error_msg}\n\nIzmene su sačuvane u dnevniku izmena i biće "
+            f"upisane u Excel fajl pri sledećem pokretanju programa."
+        )
+    thumbnails.close()  # Drop queued previews and prefetches
+    root.destroy()
+
+root.protocol("WM_DELETE_WINDOW", on_close)
+
+if journal.entries():
+    compactor.schedule()
+
 
 # --- Start ---
 if data:
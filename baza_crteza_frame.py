@@ -0,0 +1,173 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from baza_crteza_search import RANK_LIMIT, RankedResults, normalize, ranked_query
+
+
+def normalized_column(series):
+    """Vectorized normalize(): lower case text without non-word characters
+
+    Gives what normalize() gives for every cell: "" for None and falsy
+    values (0, 0.0, False, ""), "nan" for NaN.
+    """
+    text = series.astype(str).str.lower().str.replace(r"\W+", "", regex=True)
+    text = text.mask(series.isin([0, ""]), "")
+    # astype(str) leaves None and NaN missing, only those cells are looked at one by one
+    missing = np.flatnonzero(series.isna().to_numpy())
+    if len(missing):
+        text.iloc[missing] = ["nan" if isinstance(value, float) else ""
+                              for value in series.iloc[missing]]
+    return text
+
+def _word_start_pattern(query):
+    """Regex for a lower case value with a word starting with the normalized
+    query (separators may come between its characters)
+    """
+    return r"(?<!\w)" + r"\W*".join(map(re.escape, query))
+
+
+class FrameSearch:
+    """Searches over normalized string columns of a DataFrame
+
+    Each searched field gets a normalized column built from the frame on
+    first use; exact, prefix and contains matches are vectorized str
+    operations that return row positions. Scripts report edits with
+    update/insert/delete (passing the record) so the columns stay in step
+    with data. The frame is only read for columns that are not built yet,
+    so the first edit builds all of them while it still matches the data.
+
+    A single contains term is ranked like SearchCache.ranked(), with the
+    ranks computed on whole columns (the lower case text of a field is kept
+    for the word start rank).
+    """
+
+    def __init__(self, df, fields):
+        self.df = df
+        self.fields = list(fields)
+        self._columns = {}
+        self._texts = {}
+        self._length = len(df)
+
+    def column(self, field):
+        """Normalized values of a field as a Series with positions 0..n-1"""
+        column = self._columns.get(field)
+        if column is None:
+            if field in self.df.columns:
+                column = normalized_column(self.df[field]).reset_index(drop=True)
+            else:
+                column = pd.Series([""] * self._length, dtype=object)
+            self._columns[field] = column
+        return column
+
+    def text(self, field):
+        """Lower case values of a field as a Series with positions 0..n-1"""
+        text = self._texts.get(field)
+        if text is None:
+            if field in self.df.columns:
+                text = self.df[field].astype(str).str.lower().reset_index(drop=True)
+            else:
+                text = pd.Series([""] * self._length, dtype=object)
+            self._texts[field] = text
+        return text
+
+    def _build_all(self):
+        for field in self.fields:
+            self.column(field)
+            self.text(field)
+
+    def _cells(self, rec):
+        """(columns, field, value of rec) for the normalized and the text column of every field"""
+        for field in self.fields:
+            value = rec.get(field)
+            yield self._columns, field, normalize(value)
+            yield self._texts, field, str(value).lower()
+
+    def update(self, idx, rec):
+        """Record at idx was changed"""
+        self._build_all()
+        for columns, field, value in self._cells(rec):
+            columns[field].iat[idx] = value
+
+    def insert(self, idx, rec):
+        """Record was inserted at idx (or appended)"""
+        self._build_all()
+        for columns, field, value in self._cells(rec):
+            column = columns[field]
+            value = pd.Series([value], dtype=column.dtype)
+            columns[field] = pd.concat([column.iloc[:idx], value, column.iloc[idx:]], ignore_index=True)
+        self._length += 1
+
+    def delete(self, idx):
+        """Record at idx was removed"""
+        self._build_all()
+        for columns in (self._columns, self._texts):
+            for field, column in columns.items():
+                columns[field] = column.drop(index=idx).reset_index(drop=True)
+        self._length -= 1
+
+    def _mask(self, fields, mode, query):
+        mask = np.zeros(self._length, dtype=bool)
+        for field in fields:
+            values = self.column(field)
+            if mode == "exact":
+                matches = values == query
+            elif mode == "prefix":
+                matches = values.str.startswith(query)
+            else:
+                matches = values.str.contains(query, regex=False)
+            mask |= matches.to_numpy(dtype=bool)
+        return mask
+
+    def ranked(self, field, query, limit=RANK_LIMIT):
+        """Best limit rows whose field contains the normalized query, in the
+        order of SearchCache.ranked() (exact, prefix, word start, the rest,
+        data order within each rank), as RankedResults
+        """
+        values = self.column(field)
+        results = RankedResults()
+        results.field, results.query = field, query
+        if not query:
+            results.extend(range(min(limit, self._length)))
+            results.more = self._length > limit
+            return results
+        positions = np.flatnonzero(values.str.contains(query, regex=False).to_numpy(dtype=bool))
+        matched = values.iloc[positions]
+        ranks = np.full(len(positions), 3, dtype=np.int8)
+        ranks[matched.str.startswith(query).to_numpy(dtype=bool)] = 1
+        ranks[(matched == query).to_numpy(dtype=bool)] = 0
+        # Word starts need the text, only look for them if the best ranks leave room
+        if np.count_nonzero(ranks < 2) < limit:
+            rest = np.flatnonzero(ranks == 3)
+            texts = self.text(field).iloc[positions[rest]]
+            ranks[rest[texts.str.contains(_word_start_pattern(query)).to_numpy(dtype=bool)]] = 2
+        order = np.argsort(ranks, kind="stable")
+        results.extend(positions[order[:limit]].tolist())
+        results.more = len(positions) > limit
+        return results
+
+    def next_page(self, results, page=RANK_LIMIT):
+        """results of ranked() with up to page more rows at the end"""
+        return self.ranked(results.field, results.query, limit=len(results) + page)
+
+    def query(self, terms):
+        """Row positions matching every term from parse_query(), None for
+        fuzzy terms (SearchCache finds those)
+
+        A single contains term on one field is ranked(). Like SearchCache,
+        exact and prefix searches on CRTEZBROJ come in drawing number order,
+        everything else in data order.
+        """
+        if any(mode == "fuzzy" for _, mode, _ in terms):
+            return None
+        if ranked_query(terms) and terms[0][1] == "contains":
+            return self.ranked(terms[0][0][0], terms[0][2])
+        mask = np.ones(self._length, dtype=bool)
+        for fields, mode, query in terms:
+            mask &= self._mask(fields, mode, query)
+        positions = np.flatnonzero(mask)
+        if ranked_query(terms):
+            values = self.column(terms[0][0][0]).to_numpy()[positions]
+            positions = positions[np.argsort(values, kind="stable")]
+        return positions.tolist()
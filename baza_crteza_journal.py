@@ -0,0 +1,224 @@
+import json
+import os
+import threading
+
+
+def _display_value(value):
+    """Value as shown in the form - used to compare records from different loaders"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+def same_record(a, b, fields):
+    """Check if two records hold the same values in all fields"""
+    return all(_display_value(a.get(f)) == _display_value(b.get(f)) for f in fields)
+
+
+class EditJournal:
+    """Append-only JSON Lines log of edits not yet written to the Excel file
+
+    Each entry carries the row it expects to find at its index ("before"),
+    so entries that already reached the Excel file are skipped on replay.
+    """
+
+    def __init__(self, path, fields):
+        self.path = path
+        self.fields = fields
+        self._lock = threading.Lock()
+
+    def _record(self, rec):
+        return {f: rec.get(f) for f in self.fields}
+
+    def _append(self, entry):
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        try:
+            with self._lock:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            return True, None
+        except OSError as e:
+            return False, f"Greška pri upisu u dnevnik izmena '{self.path}': {str(e)}"
+
+    def append_save(self, idx, before, rec):
+        """Log a saved record (before=None for a new record at the end)"""
+        return self._append({
+            "op": "save",
+            "idx": idx,
+            "before": None if before is None else self._record(before),
+            "record": self._record(rec),
+        })
+
+    def append_delete(self, idx, before):
+        """Log a deleted record"""
+        return self._append({"op": "delete", "idx": idx, "before": self._record(before)})
+
+    def _read_lines(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return f.readlines()
+        except FileNotFoundError:
+            return []
+
+    def entries(self):
+        """Return all pending entries in order"""
+        with self._lock:
+            lines = self._read_lines()
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # Incomplete last line after a crash - everything before it is valid
+                break
+        return entries
+
+    def _rewrite(self, lines):
+        if not lines:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def drop(self, count):
+        """Remove the first count entries after they were written to the Excel file"""
+        with self._lock:
+            self._rewrite(self._read_lines()[count:])
+
+    def _apply(self, rows, entries):
+        """Apply entries to rows in order, False if an entry does not match its row"""
+        for entry in entries:
+            idx = entry.get("idx")
+            before = entry.get("before")
+            if entry.get("op") == "save" and before is None:
+                if idx != len(rows):
+                    return False
+                rows.append(dict(entry["record"]))
+                continue
+            if idx >= len(rows) or not same_record(rows[idx], before, self.fields):
+                return False
+            if entry.get("op") == "save":
+                rows[idx] = dict(rows[idx], **entry["record"])
+            else:
+                del rows[idx]
+        return True
+
+    def replay(self, data):
+        """Apply pending entries to freshly loaded data, return (number applied, warning)
+
+        A crash between writing the Excel file and dropping the entries leaves
+        entries that are already in the file. The first suffix of the journal
+        that applies cleanly is the part still missing, the rest is removed.
+        If none does and the last entry is not in the file either (the file
+        was changed outside the app), nothing is applied and the entries are
+        moved to the .rejected file next to the journal.
+        """
+        entries = self.entries()
+        for start in range(len(entries) + 1):
+            rows = list(data)
+            if self._apply(rows, entries[start:]):
+                break
+        if entries and start == len(entries) and not self._written(data, entries[-1]):
+            rejected = self.path + ".rejected"
+            try:
+                with self._lock:
+                    with open(rejected, "a", encoding="utf-8") as f:
+                        f.writelines(self._read_lines())
+                    self._rewrite([])
+            except OSError as e:
+                return 0, f"Greška pri čuvanju dnevnika izmena u '{rejected}': {str(e)}"
+            return 0, (
+                f"Izmene iz dnevnika ({len(entries)}) ne odgovaraju Excel fajlu, koji je "
+                f"verovatno menjan van programa, i nisu primenjene.\n\n"
+                f"Dnevnik je sačuvan kao '{rejected}'."
+            )
+        data[:] = rows
+
+        pending = entries[start:]
+        with self._lock:
+            self._rewrite([json.dumps(e, ensure_ascii=False, default=str) + "\n" for e in pending])
+        return len(pending), None
+
+    def _written(self, rows, entry):
+        """Whether a saved entry is visible in rows (deletes cannot be told apart)"""
+        idx = entry.get("idx")
+        return (entry.get("op") == "save" and idx is not None and idx < len(rows)
+                and same_record(rows[idx], entry["record"], self.fields))
+
+
+class BackgroundCompactor:
+    """Fold journal entries into the Excel file on the save worker when the app is idle
+
+    fold(entries) is called on the Tk thread and returns a function that writes
+    the entries to the Excel file off the Tk thread and returns (success, error).
+    on_status(state, error) is called with "pending", "saving", "saved" or "error".
+    """
+
+    def __init__(self, root, journal, fold, worker, delay_ms=5000, on_status=None):
+        self.root = root
+        self.journal = journal
+        self.fold = fold
+        self.worker = worker
+        self.delay_ms = delay_ms
+        self.on_status = on_status or (lambda state, error=None: None)
+        self._after_id = None
+        self._busy = False  # A compact job is queued or running
+
+    def schedule(self):
+        """(Re)start the idle timer after an edit"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+        self._after_id = self.root.after(self.delay_ms, self._start)
+        self.on_status("pending")
+
+    def _start(self):
+        self._after_id = None
+        if self._busy:
+            # The running job drops the entries it wrote, folding them again
+            # now would write them twice
+            self.schedule()
+            return
+        entries = self.journal.entries()
+        if not entries:
+            self.on_status("saved")
+            return
+        write = self.fold(entries)
+        self._busy = True
+        self.worker.submit("compact", lambda: self._compact(write, len(entries)), self._done)
+        self.on_status("saving")
+
+    def _compact(self, write, count):
+        success, error = write()
+        if success:
+            self.journal.drop(count)
+        return success, error
+
+    def _done(self, success, error):
+        self._busy = False
+        if not success:
+            self.on_status("error", error)
+        elif self._after_id is None:
+            # Edits made while the job was running
+            if self.journal.entries():
+                self.schedule()
+            else:
+                self.on_status("saved")
+
+    def flush(self):
+        """Write all pending entries synchronously (used when closing the app)"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self.worker.wait()
+        entries = self.journal.entries()
+        if not entries:
+            return True, None
+        return self._compact(self.fold(entries), len(entries))
@@ -1,13 +1,19 @@
 import json
 import os
-import re
 import tkinter as tk
 from tkinter import ttk, messagebox
 import tkinter.font as tkFont
 import webbrowser
-
-JSON_FILE = "baza_crteza.json"
+from baza_crteza_jsonl import JsonlStore
+from baza_crteza_search import SearchCache, parse_query, result_count, SEARCH_MODES
+from baza_crteza_table import RecordTable, ResultsPanel
+from baza_crteza_preview import ThumbnailCache, DrawingPreview, neighbours
+from baza_crteza_drawings import DrawingIndex, drawing_file, format_report, show_report
+
+JSON_FILE = "baza_crteza.json"    # Legacy file, imported once
+JSONL_FILE = "baza_crteza.jsonl"
 DRAWINGS_FOLDER = "crtezi"
+THUMB_FOLDER = "miniature"  # Drawing thumbnails for the preview
 
 FIELDS = [
     "IDENTBROJ", "CRTEZBROJ", "NAZIVDELA", "TEHNPODACI",
@@ -17,15 +23,31 @@ FIELDS = [
 ]
 
 # --- Load JSON ---
-try:
-    with open(JSON_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
-except FileNotFoundError:
-    messagebox.showerror("Greška", f"{JSON_FILE} nije pronađen!")
-    data = []
-except json.JSONDecodeError:
-    messagebox.showerror("Greška", f"{JSON_FILE} nije validan JSON fajl!")
-    data = []
+store = JsonlStore(JSONL_FILE, FIELDS)
+if os.path.exists(JSONL_FILE):
+    data, error = store.load()
+    if error:
+        messagebox.showerror("Greška", error)
+else:
+    # First start - import the legacy JSON file
+    try:
+        with open(JSON_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        data, error = store.import_records(data)
+        if error:
+            messagebox.showerror("Greška", error)
+    except FileNotFoundError:
+        messagebox.showerror("Greška", f"{JSON_FILE} nije pronađen!")
+        data = []
+    except json.JSONDecodeError:
+        messagebox.showerror("Greška", f"{JSON_FILE} nije validan JSON fajl!")
+        data = []
+
+search_cache = SearchCache(data)
+search_cache.start_index(FIELDS)  # Trigram index is built in the background
+thumbnails = ThumbnailCache(THUMB_FOLDER)  # Drawing previews are made on a thread pool
+drawing_index = DrawingIndex(DRAWINGS_FOLDER)
+drawing_index.start()  # The drawings folder is read once in the background
 
 current_index = None
 search_results = []
@@ -53,6 +75,7 @@ search_frame = ttk.Frame(root, padding=10, relief="solid", borderwidth=1)
 search_frame.pack(fill=tk.X, padx=10, pady=10)
 
 search_field_var = tk.StringVar(value="CRTEZBROJ")
+search_mode_var = tk.StringVar(value="Sadrži")
 search_value_var = tk.StringVar()
 
 inner_frame = ttk.Frame(search_frame)
@@ -61,15 +84,12 @@ inner_frame.pack()
 ttk.Label(inner_frame, text="Traži u:").pack(side=tk.LEFT, padx=5)
 search_field_menu = ttk.Combobox(inner_frame, textvariable=search_field_var, values=FIELDS, width=15)
 search_field_menu.pack(side=tk.LEFT, padx=5)
+search_mode_menu = ttk.Combobox(inner_frame, textvariable=search_mode_var, values=list(SEARCH_MODES), width=10, state="readonly")
+search_mode_menu.pack(side=tk.LEFT, padx=5)
 ttk.Label(inner_frame, text="Vrednost:").pack(side=tk.LEFT, padx=5)
 search_value_entry = ttk.Entry(inner_frame, textvariable=search_value_var, width=30, justify='center')
 search_value_entry.pack(side=tk.LEFT, padx=5, pady=5, ipadx=5, ipady=8)
 
-def normalize(s):
-    if not s:
-        return ""
-    return re.sub(r"\W+", "", str(s).lower())
-
 def load_record(idx):
     global current_index
     if not data:
@@ -83,34 +103,58 @@ def load_record(idx):
             entry.insert(0, "" if val is None else str(val))
     current_index = idx
     record_number_var.set(f"{idx+1}/{len(data)}")
+    record_table.show(idx)
+    drawing_preview.show(drawing_index.path(rec.get("CRTEZBROJ")))
+    prefetch_drawings(idx)
+
+def prefetch_drawings(idx):
+    # Warm the drawings around idx, in search result order while going through the results
+    if 0 <= search_index < len(search_results) and search_results[search_index] == idx:
+        nearby = neighbours(search_results, search_index)
+    else:
+        nearby = neighbours(range(len(data)), idx)
+    thumbnails.prefetch([drawing_index.path(data[i].get("CRTEZBROJ")) for i in nearby])
 
 search_counter_var = tk.StringVar(value="")
 def do_search():
     global search_results, search_index
-    key = search_field_var.get()
-    val = re.sub(r"\W+", "", search_value_var.get().strip().lower())
-    search_results = [
-        i for i, rec in enumerate(data)
-        if val in normalize(rec.get(key))
-    ]
+    # "FORMAT=A3 NAZIVDELA~vijak" searches several fields at once
+    terms, error = parse_query(search_value_var.get().strip(), FIELDS, search_field_var.get(),
+                               SEARCH_MODES[search_mode_var.get()])
+    if error:
+        messagebox.showerror("Pretraga", error)
+        return
+    search_results = search_cache.query(terms)
+    results_panel.set_results(search_results)
     if search_results:
-        search_index = 0
-        load_record(search_results[search_index])
-        search_counter_var.set(f"{search_index+1}/{len(search_results)}")
+        show_result(0)
     else:
         search_index = 0
         search_counter_var.set("")
         messagebox.showinfo("Pretraga", "Ništa nije pronađeno!")
 
-def next_result():
+def show_result(n):
+    # Load search result n and select it in the results panel
     global search_index
+    search_index = n
+    load_record(search_results[n])
+    search_counter_var.set(f"{n+1}/{result_count(search_results)}")
+    results_panel.show(n)
+
+def next_result():
     if not search_results:
         return
-    search_index += 1
-    if search_index >= len(search_results):
-        search_index = 0
-    load_record(search_results[search_index])
-    search_counter_var.set(f"{search_index+1}/{len(search_results)}")
+    # Past the last loaded hit of a ranked search, load its next page first
+    if search_index == len(search_results) - 1 and getattr(search_results, "more", False):
+        load_more_results()
+    show_result((search_index + 1) % len(search_results))
+
+def load_more_results():
+    # Next page of a ranked search, when the results panel is scrolled to its end
+    global search_results
+    search_results = search_cache.next_page(search_results)
+    results_panel.more_results(search_results)
+    search_counter_var.set(f"{search_index+1}/{result_count(search_results)}")
 
 ttk.Button(inner_frame, text="Traži", command=do_search).pack(side=tk.LEFT, padx=5)
 ttk.Button(inner_frame, text="Sledeći", command=next_result).pack(side=tk.LEFT, padx=5)
@@ -122,6 +166,18 @@ ttk.Label(inner_frame, textvariable=search_counter_var, width=8, anchor="center"
 record_frame = ttk.Frame(root, padding=20)
 record_frame.pack(fill=tk.BOTH, expand=True)
 
+# --- Side column: drawing preview and search results ---
+side_frame = ttk.Frame(root)
+side_frame.pack(before=record_frame, side=tk.RIGHT, fill=tk.Y, padx=(0,10))
+
+# Click on the preview opens the drawing in the external viewer
+drawing_preview = DrawingPreview(side_frame, thumbnails, on_click=lambda: open_drawing())
+drawing_preview.frame.pack(side=tk.TOP, pady=(0, 10))
+
+# Search results are shown while there are any
+results_panel = ResultsPanel(side_frame, data, show_result, on_end=load_more_results,
+                             side=tk.TOP, fill=tk.BOTH, expand=True)
+
 entries = {}
 
 def make_entry(parent, label_text, field_name, width=30):
@@ -199,6 +255,8 @@ def add_record():
     
     record_number_var.set(f"{current_index+1}/{len(data)+1}")
     search_results = []
+    results_panel.set_results([])
+    drawing_preview.show(None)
 
 def save_record():
     global current_index
@@ -206,13 +264,13 @@ def save_record():
     if current_index is None:
         return
     
-    if current_index >= len(data):
+    is_new = current_index >= len(data)
+    if is_new:
         # New record at the end
         rec = {}
-        data.append(rec)
     else:
-        # Existing record
-        rec = data[current_index]
+        # Existing record, changed in data only once it is written
+        rec = dict(data[current_index])
     
     ident_str = entries["IDENTBROJ"].get().strip()
     if ident_str == "":
@@ -230,8 +288,20 @@ def save_record():
         val = entries[f].get().strip()
         rec[f] = None if val == "" else val
 
-    with open(JSON_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    ok, error = store.append_save(rec)
+    if not ok:
+        messagebox.showerror("Greška", error)
+        return
+
+    if is_new:
+        data.append(rec)
+        search_cache.insert(current_index)
+    else:
+        data[current_index] = rec
+        search_cache.update(current_index)
+    record_table.show(current_index)
+    results_panel.refresh()
+    drawing_preview.show(drawing_index.path(rec.get("CRTEZBROJ")))
 
     messagebox.showinfo("Sačuvaj", "Unos sačuvan!")
 
@@ -251,9 +321,12 @@ def delete_record():
         return
 
     # Remove from data
+    ok, error = store.append_delete(data[current_index])
+    if not ok:
+        messagebox.showerror("Greška", error)
+        return
     del data[current_index]
-    with open(JSON_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    search_cache.delete(current_index)
     messagebox.showinfo("Brisanje", "Unos izbrisan!")
 
     # Reset current index
@@ -262,12 +335,15 @@ def delete_record():
         for e in entries.values():
             e.delete(0, tk.END)
         record_number_var.set("0/0")
+        drawing_preview.show(None)
+        record_table.refresh()
     else:
         if current_index >= len(data):
             current_index = len(data) - 1
         load_record(current_index)
 
     search_results = []  # clear search results
+    results_panel.set_results([])
    
 save_button = ttk.Button(right_frame, text="Sačuvaj Unos")
 save_button.pack(pady=5, fill=tk.X)
@@ -302,13 +378,18 @@ def goto_record():
     global current_index
     if not data:
         return
+    text = record_number_entry.get().strip()
     try:
-        idx = int(record_number_entry.get()) - 1
-        if 0 <= idx < len(data):
-            current_index = idx
-            load_record(current_index)
+        idx = int(text) - 1
     except ValueError:
-        pass
+        # Not a record number - try it as a drawing number
+        matches = search_cache.search("CRTEZBROJ", text, "exact")
+        if matches:
+            load_record(matches[0])
+        return
+    if 0 <= idx < len(data):
+        current_index = idx
+        load_record(current_index)
 
 def next_record_nav():
     global current_index
@@ -335,17 +416,34 @@ ttk.Button(nav_frame, text="Idi", command=goto_record).pack(side=tk.LEFT, padx=5
 ttk.Button(nav_frame, text="Sledeći >>", command=next_record_nav).pack(side=tk.LEFT, padx=5)
 ttk.Button(nav_frame, text="Poslednji >>", command=last_record).pack(side=tk.LEFT, padx=5)
 
+# Table of all records, selecting a row loads it into the form
+record_table = RecordTable(root, data, FIELDS, load_record, title="Tabela crteža")
+ttk.Button(nav_frame, text="Tabela", command=lambda: record_table.open(current_index)).pack(side=tk.LEFT, padx=(15,5))
+
+def drawings_report():
+    # Records without a drawing, drawings without a record and misnamed files
+    # Read the folder again so the report is up to date
+    success, error_msg = drawing_index.scan()
+    if not success:
+        messagebox.showerror("Greška", error_msg)
+        return
+    report = drawing_index.report(data)
+    show_report(root, "Provera crteža", format_report(report, DRAWINGS_FOLDER))
+
+ttk.Button(nav_frame, text="Provera crteža", command=drawings_report).pack(side=tk.LEFT, padx=5)
+
 
 def open_drawing():
     crtez = entries["CRTEZBROJ"].get().strip()
     if not crtez:
         return
-    filename = crtez.replace("/", "-").replace("\\", "-") + ".jpg"
-    path = os.path.join(DRAWINGS_FOLDER, filename)
-    if os.path.exists(path):
+    path = drawing_index.path(crtez)
+    # Unchecked until the drawings folder has been read
+    if path and (drawing_index.ready or os.path.exists(path)):
         webbrowser.open(path)
     else:
-        messagebox.showinfo("Otvori crtež", f"Fajl nije pronađen: {path}")
+        messagebox.showinfo("Otvori crtež",
+                            f"Fajl nije pronađen: {os.path.join(DRAWINGS_FOLDER, drawing_file(crtez))}")
 
 open_btn.config(command=open_drawing)
 
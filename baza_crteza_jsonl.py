@@ -0,0 +1,159 @@
+import json
+import os
+
+RECORD_ID = "_id"          # Stable record id, kept in the record dicts
+DELETED_KEY = "_deleted"   # Marks a tombstone line
+
+# Compact when the file holds this many superseded lines and more than live ones
+COMPACT_MIN_GARBAGE = 1000
+
+
+class JsonlStore:
+    """Records in a JSON Lines file, one line per record version
+
+    A save appends the whole record with its id, a delete appends a tombstone
+    ({"_id": n, "_deleted": true}). The last line for an id wins and records
+    keep the position where their id first appeared. The file is rewritten
+    with only live records once superseded lines outnumber them.
+
+    records holds the line last written for each live record, so it only
+    changes after a write succeeded and compact() writes what is on disk.
+    After a failed load() the store is empty and refuses to write (it
+    would reuse ids and compact away the records it could not read).
+    """
+
+    def __init__(self, path, fields):
+        self.path = path
+        self.fields = fields
+        self.records = {}
+        self.next_id = 1
+        self.lines = 0
+        self.load_error = None
+
+    def _reset(self, error=None):
+        self.records = {}
+        self.next_id = 1
+        self.lines = 0
+        self.load_error = error
+
+    def _line(self, rec_id, rec):
+        entry = {RECORD_ID: rec_id}
+        entry.update((f, rec.get(f)) for f in self.fields)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+    def load(self):
+        """Stream the file into records, return (data, error)"""
+        self._reset()
+        live = {}
+        valid_end = 0
+        terminated = True
+        try:
+            with open(self.path, "rb") as f:
+                for raw in f:
+                    try:
+                        entry = json.loads(raw)
+                        rec_id = entry[RECORD_ID]
+                    except (ValueError, KeyError, TypeError):
+                        if f.read(1):
+                            self._reset(f"{self.path} je oštećen (red {self.lines + 1})!")
+                            return [], self.load_error
+                        # Incomplete last line after a crash - everything before it is valid
+                        break
+                    valid_end += len(raw)
+                    # A last line cut just before its "\n" is still whole
+                    terminated = raw.endswith(b"\n")
+                    self.lines += 1
+                    self.next_id = max(self.next_id, rec_id + 1)
+                    if entry.get(DELETED_KEY):
+                        live.pop(rec_id, None)
+                        self.records.pop(rec_id, None)
+                        continue
+                    if rec_id in live:
+                        live[rec_id].update(entry)
+                    else:
+                        live[rec_id] = entry
+                    self.records[rec_id] = raw.decode("utf-8").rstrip("\r\n")
+            if valid_end < os.path.getsize(self.path):
+                with open(self.path, "r+b") as f:
+                    f.truncate(valid_end)
+            elif not terminated:
+                with open(self.path, "ab") as f:
+                    f.write(b"\n")
+        except OSError as e:
+            self._reset(f"Greška pri čitanju '{self.path}': {str(e)}")
+            return [], self.load_error
+        return list(live.values()), None
+
+    def import_records(self, records):
+        """Take over records from the legacy JSON file and write them out"""
+        self._reset()
+        for rec in records:
+            rec[RECORD_ID] = self.next_id
+            self.records[self.next_id] = self._line(self.next_id, rec)
+            self.next_id += 1
+        _, error = self.compact()
+        return records, error
+
+    def _refused(self):
+        return False, f"{self.load_error}\nIzmene se ne čuvaju dok se fajl ne popravi."
+
+    def _append(self, line):
+        if self.load_error:
+            return self._refused()
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            return False, f"Greška pri upisu u '{self.path}': {str(e)}"
+        self.lines += 1
+        return True, None
+
+    def _compact_if_needed(self):
+        if self.lines - len(self.records) > max(COMPACT_MIN_GARBAGE, len(self.records)):
+            return self.compact()
+        return True, None
+
+    def append_save(self, rec):
+        """Append the current version of rec (a new record gets an id and goes last)"""
+        rec_id = rec.get(RECORD_ID)
+        if rec_id is None:
+            rec_id = self.next_id
+        line = self._line(rec_id, rec)
+        ok, error = self._append(line)
+        if not ok:
+            return ok, error
+        if rec.get(RECORD_ID) is None:
+            rec[RECORD_ID] = rec_id
+            self.next_id += 1
+        self.records[rec_id] = line
+        return self._compact_if_needed()
+
+    def append_delete(self, rec):
+        """Append a tombstone for rec"""
+        rec_id = rec.get(RECORD_ID)
+        if rec_id is None:
+            return True, None
+        ok, error = self._append(json.dumps({RECORD_ID: rec_id, DELETED_KEY: True}))
+        if not ok:
+            return ok, error
+        self.records.pop(rec_id, None)
+        return self._compact_if_needed()
+
+    def compact(self):
+        """Rewrite the file with one line per live record"""
+        if self.load_error:
+            return self._refused()
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for line in self.records.values():
+                    f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            return False, f"Greška pri sažimanju '{self.path}': {str(e)}"
+        self.lines = len(self.records)
+        return True, None
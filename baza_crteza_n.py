@@ -1,10 +1,21 @@
 import os
-import re
 import tkinter as tk
 from tkinter import ttk, messagebox
 import tkinter.font as tkFont
 import webbrowser
-from openpyxl import load_workbook
+import queue
+from datetime import datetime
+import threading
+from baza_crteza_cache import load_cached_data, file_unchanged
+from baza_crteza_xlsx import read_xlsx_rows
+from baza_crteza_store import RecordStore, diff_records, apply_changes
+from baza_crteza_watch import FileWatcher
+from baza_crteza_search import SearchCache, parse_query, result_count, SEARCH_MODES
+from baza_crteza_saver import BackgroundWorker
+from baza_crteza_shards import ShardedSearch
+from baza_crteza_table import RecordTable, ResultsPanel
+from baza_crteza_preview import ThumbnailCache, DrawingPreview, neighbours
+from baza_crteza_drawings import DrawingIndex, drawing_file, format_report, show_report
 
 def load_config():
     config_file = "config.txt"
@@ -32,6 +43,20 @@ EXCEL_FILENAME = config.get("EXCEL_FILENAME", "BAZACRTEZA.xlsx")
 EXCEL_FILE = os.path.join(BASE_FOLDER, EXCEL_FILENAME)
 DRAWINGS_FOLDER = os.path.join(BASE_FOLDER, "crtezi")
 
+# Automatic reload when the Excel file changes (seconds between checks, 0 = off)
+WATCH_INTERVAL = float(config.get("WATCH_INTERVAL", "0"))
+
+# Search in worker processes from this many records on (0 = off). Off by
+# default: turn it on only where bench_shards.py shows the processes are faster
+PARALLEL_MIN_ROWS = int(config.get("PARALLEL_MIN_ROWS", "0"))
+
+# Drawing thumbnails for the preview, kept between runs
+THUMB_FOLDER = config.get("THUMB_FOLDER", os.path.join(".", "miniature"))
+
+# Drawings warmed on each side of the shown one (0 = off), most MB read for them at a time
+PREFETCH_DRAWINGS = int(config.get("PREFETCH_DRAWINGS", "3"))
+PREFETCH_MB = float(config.get("PREFETCH_MB", "64"))
+
 FIELDS = [
     "IDENTBROJ", "CRTEZBROJ", "NAZIVDELA", "TEHNPODACI",
     "KATALBROJ", "FORMAT", "ARHIVA", "KOMENTAR",
@@ -40,32 +65,34 @@ FIELDS = [
 ]
 
 def load_excel_data(filename):
-    """Load Excel data using openpyxl instead of pandas"""
+    """Load Excel data with the streaming xlsx reader instead of openpyxl"""
     try:
-        wb = load_workbook(filename, read_only=True, data_only=True)
-        ws = wb.active
-        
-        # Get headers from first row
-        headers = [cell.value for cell in ws[1]]
-        
-        # Load data rows
         data = []
-        for row in ws.iter_rows(min_row=2, values_only=True):
+        for row in read_xlsx_rows(filename, FIELDS):
             record = {}
-            for i, header in enumerate(headers):
+            for field, value in zip(FIELDS, row):
                 # Handle None values and convert to appropriate types
-                value = row[i] if i < len(row) else None
-                record[header] = None if value is None else str(value).strip() if value != "" else None
+                if field == "IDENTBROJ" and type(value) is int:
+                    record[field] = value  # Kept as integer for the record store
+                else:
+                    record[field] = None if value is None else str(value).strip() if value != "" else None
             data.append(record)
         
-        wb.close()
         return data, None
     except FileNotFoundError:
         return [], f"{filename} nije pronađen!"
     except Exception as e:
         return [], f"Greška pri učitavanju {filename}: {str(e)}"
 
-data, error = load_excel_data(EXCEL_FILE)
+data, error, data_key = load_cached_data(EXCEL_FILE, load_excel_data)
+data = RecordStore(FIELDS, data)
+search_cache = SearchCache(data)
+search_cache.start_index(FIELDS)  # Trigram index is built in the background
+sharded_search = ShardedSearch(data, FIELDS, PARALLEL_MIN_ROWS)  # Only for large registers
+# Drawing previews are made on a thread pool
+thumbnails = ThumbnailCache(THUMB_FOLDER, prefetch_bytes=int(PREFETCH_MB * 1024 * 1024))
+drawing_index = DrawingIndex(DRAWINGS_FOLDER)
+drawing_index.start()  # The drawings folder is read once in the background
 
 current_index = None
 search_results = []
@@ -116,6 +143,7 @@ search_frame = ttk.Frame(root, relief="flat", borderwidth=1)
 search_frame.pack(fill=tk.X, padx=10, pady=5)
 
 search_field_var = tk.StringVar(value="CRTEZBROJ")
+search_mode_var = tk.StringVar(value="Sadrži")
 search_value_var = tk.StringVar()
 
 inner_frame = ttk.Frame(search_frame)
@@ -125,6 +153,9 @@ ttk.Label(inner_frame, text="Traži u:").pack(side=tk.LEFT, padx=0)
 search_field_menu = ttk.Combobox(inner_frame, textvariable=search_field_var, 
                                   values=FIELDS, width=15, state="readonly")
 search_field_menu.pack(side=tk.LEFT, padx=5)
+search_mode_menu = ttk.Combobox(inner_frame, textvariable=search_mode_var,
+                                values=list(SEARCH_MODES), width=10, state="readonly")
+search_mode_menu.pack(side=tk.LEFT, padx=5)
 ttk.Label(inner_frame, text="Vrednost:").pack(side=tk.LEFT, padx=(15, 0))
 search_value_entry = ttk.Entry(inner_frame, textvariable=search_value_var, 
                                width=30, justify='center')
@@ -132,12 +163,6 @@ search_value_entry.pack(side=tk.LEFT, padx=0, pady=5, ipadx=5, ipady=8)
 
 record_number_var = tk.StringVar()
 
-def normalize(s):
-    """Normalize string for comparison"""
-    if not s:
-        return ""
-    return re.sub(r"\W+", "", str(s).lower())
-
 def load_record(idx):
     """Load record at given index into UI"""
     global current_index
@@ -156,61 +181,240 @@ def load_record(idx):
     
     current_index = idx
     record_number_var.set(f"{idx + 1}/{len(data)}")
+    record_table.show(idx)
+    drawing_preview.show(drawing_index.path(rec.get("CRTEZBROJ")))
+    prefetch_drawings(idx)
+
+def prefetch_drawings(idx):
+    """Warm the drawings around idx, in search result order while going through the results"""
+    if 0 <= search_index < len(search_results) and search_results[search_index] == idx:
+        nearby = neighbours(search_results, search_index, PREFETCH_DRAWINGS)
+    else:
+        nearby = neighbours(range(len(data)), idx, PREFETCH_DRAWINGS)
+    thumbnails.prefetch([drawing_index.path(data[i].get("CRTEZBROJ")) for i in nearby])
 
 search_counter_var = tk.StringVar(value="")
 
+def run_query(terms, cancelled=None):
+    """Search in the worker processes if they are running, here otherwise"""
+    results = sharded_search.query(terms)
+    if results is None:
+        results = search_cache.query(terms, cancelled)
+    return results
+
 def do_search():
     """Perform search in selected field"""
     global search_results, search_index
     
-    key = search_field_var.get()
-    val = normalize(search_value_var.get().strip())
-    
-    if not val:
+    text = search_value_var.get().strip()
+    if not text:
         messagebox.showinfo("Pretraga", "Unesite vrednost za pretragu!")
         return
     
-    search_results = [
-        i for i, rec in enumerate(data)
-        if val in normalize(rec.get(key))
-    ]
+    # "FORMAT=A3 NAZIVDELA~vijak" searches several fields at once
+    terms, error = parse_query(text, FIELDS, search_field_var.get(), SEARCH_MODES[search_mode_var.get()])
+    if error:
+        messagebox.showerror("Pretraga", error)
+        return
+    
+    cancel_live_search()
+    last = live_search["last"]
+    if last and (last["terms"], last["version"]) == (terms, search_cache.version):
+        # Already found while typing
+        search_results = last["results"]
+        search_cache.remember(terms, search_results)
+    else:
+        search_results = run_query(terms)
     
+    results_panel.set_results(search_results)
     if search_results:
-        search_index = 0
-        load_record(search_results[search_index])
-        search_counter_var.set(f"{search_index + 1}/{len(search_results)}")
+        show_result(0)
     else:
         search_index = 0
         search_counter_var.set("")
         messagebox.showinfo("Pretraga", "Ništa nije pronađeno!")
 
+def show_result(n):
+    """Load search result n and select it in the results panel"""
+    global search_index
+    search_index = n
+    load_record(search_results[n])
+    search_counter_var.set(f"{n + 1}/{result_count(search_results)}")
+    results_panel.show(n)
+
 def next_result():
     """Navigate to next search result"""
-    global search_index
     if not search_results:
         return
-    search_index = (search_index + 1) % len(search_results)
-    load_record(search_results[search_index])
-    search_counter_var.set(f"{search_index + 1}/{len(search_results)}")
-
-def refresh_data():
-    """Reload data from Excel file"""
-    global data, current_index, search_results
+    # Past the last loaded hit of a ranked search, load its next page first
+    if search_index == len(search_results) - 1 and getattr(search_results, "more", False):
+        load_more_results()
+    show_result((search_index + 1) % len(search_results))
+
+def load_more_results():
+    """Next page of a ranked search, when the results panel is scrolled to its end"""
+    global search_results
+    results = sharded_search.next_page(search_results)
+    if results is None:
+        results = search_cache.next_page(search_results)
+    search_results = results
+    results_panel.more_results(search_results)
+    search_counter_var.set(f"{search_index + 1}/{result_count(search_results)}")
+
+# --- Search as you type ---
+LIVE_SEARCH_DELAY_MS = 250  # Wait for a pause in typing before searching
+
+search_worker = BackgroundWorker(root, poll_ms=30)
+live_search = {"after": None, "generation": 0, "last": None}
+
+def schedule_live_search(*args):
+    """Restart the delay on every keystroke or field/mode change"""
+    if live_search["after"] is not None:
+        root.after_cancel(live_search["after"])
+    live_search["after"] = root.after(LIVE_SEARCH_DELAY_MS, start_live_search)
+
+def cancel_live_search():
+    """Drop the pending and the running live search"""
+    if live_search["after"] is not None:
+        root.after_cancel(live_search["after"])
+        live_search["after"] = None
+    live_search["generation"] += 1
+
+def start_live_search():
+    """Run the typed query on the search worker, refine the previous results if possible"""
+    cancel_live_search()
+    generation = live_search["generation"]
+    text = search_value_var.get().strip()
+    terms, error = parse_query(text, FIELDS, search_field_var.get(), SEARCH_MODES[search_mode_var.get()])
+    if not text or error:
+        # Nothing typed yet, or an unfinished query
+        live_search["last"] = None
+        search_counter_var.set("")
+        return
+    
+    search_cache.prepare(terms)
+    version = search_cache.version
+    last = live_search["last"]
+    
+    def cancelled():
+        return generation != live_search["generation"]
     
-    new_data, error = load_excel_data(EXCEL_FILE)
+    def job():
+        results = None
+        if last and last["version"] == version:
+            results = search_cache.refine(last["terms"], last["results"], terms, cancelled)
+        if results is None:
+            results = run_query(terms, cancelled)
+        return results, None
     
+    def done(results, error):
+        global search_results, search_index
+        if cancelled():
+            return
+        if search_cache.version != version:
+            # Records were edited while searching
+            start_live_search()
+            return
+        if error or results is None:
+            return
+        live_search["last"] = {"terms": terms, "version": version, "results": results}
+        # Show the count only, Enter or "Sledeći" goes to the first hit
+        search_results = results
+        search_index = -1
+        search_counter_var.set(f"0/{result_count(results)}")
+        results_panel.set_results(results)
+    
+    cached = search_cache.cached(terms)
+    if cached is not None:
+        done(cached, None)
+    else:
+        search_worker.submit("search", job, done)
+
+def show_search_stats():
+    """Query result cache counters (F12)"""
+    stats = search_cache.stats
+    messagebox.showinfo(
+        "Statistika pretrage",
+        f"Pogoci u kešu: {stats['hits']}\n"
+        f"Promašaji: {stats['misses']}\n"
+        f"Ažurirano posle izmena: {stats['patched']}\n"
+        f"Odbačeno: {stats['dropped']}"
+    )
+
+# Only one reload at a time (manual refresh or file watcher)
+reload_lock = threading.Lock()
+RELOAD_RESET_ROWS = 1000  # Search structures are rebuilt when a reload replaces more rows
+reload_results = queue.Queue()
+
+def load_changes():
+    """Load changed workbook and diff it against data (runs off the Tk thread too)"""
+    if file_unchanged(EXCEL_FILE, data_key):
+        return None
+    
+    new_data, error, new_key = load_cached_data(EXCEL_FILE, load_excel_data)
     if error:
-        messagebox.showerror("Greška", error)
-        return
+        return {"error": error}
     
-    data = new_data
+    # Patch only changed records, rebuild if most of the file changed
+    changes = diff_records(data, new_data, "CRTEZBROJ", FIELDS)
+    return {"error": None, "data": new_data, "key": new_key, "changes": changes}
+
+def apply_loaded(result):
+    """Apply loaded changes to data and UI, return summary text"""
+    global data, data_key, current_index, search_results
+    
+    # Remember the shown record by drawing number
+    current_crtez = None
+    if current_index is not None and current_index < len(data):
+        current_crtez = data[current_index].get("CRTEZBROJ")
+    
+    changes = result["changes"]
+    if changes is None:
+        data = RecordStore(FIELDS, result["data"])
+        search_cache.reset(data)
+        sharded_search.reset(data)
+        record_table.reset(data)
+        results_panel.reset(data)
+    else:
+        ops, counts = changes
+        apply_changes(data, ops)
+        splices = [payload for op, _, payload in ops if op == "splice"]
+        if sum(count + len(records) for count, records in splices) > RELOAD_RESET_ROWS:
+            # Each row edit shifts whole lists, building them again is cheaper
+            search_cache.reset(data)
+            sharded_search.reset(data)
+        else:
+            for op, idx, payload in ops:
+                if op == "splice":
+                    count, records = payload
+                    for _ in range(count):
+                        search_cache.delete(idx)
+                        sharded_search.delete(idx)
+                    for n in range(len(records)):
+                        search_cache.insert(idx + n)
+                        sharded_search.insert(idx + n)
+                else:
+                    search_cache.update(idx)
+                    sharded_search.update(idx)
+        record_table.refresh()
+    data_key = result["key"]
     search_results = []  # Clear search results
+    search_counter_var.set("")
+    results_panel.set_results([])
+    
+    # Stay on the same drawing, or the same position if it was removed
+    if current_crtez is not None:
+        if current_index < len(data) and data[current_index].get("CRTEZBROJ") == current_crtez:
+            pass
+        else:
+            matches = data.scan("CRTEZBROJ", lambda value: value == current_crtez)
+            if matches:
+                current_index = matches[0]
     
-    # Try to stay on same record or go to first
     if current_index is not None and current_index < len(data):
         load_record(current_index)
     elif data:
-        load_record(0)
+        load_record(len(data) - 1)
     else:
         current_index = None
         for e in entries.values():
@@ -218,12 +422,72 @@ def refresh_data():
             e.delete(0, tk.END)
             e.configure(state='readonly')
         record_number_var.set("0/0")
+        drawing_preview.show(None)
     
-    messagebox.showinfo("Osveženo", "Podaci su uspešno osveženi!")
+    if changes is None:
+        return "Podaci su uspešno osveženi!"
+    return (
+        f"Podaci su uspešno osveženi!\n\n"
+        f"Izmenjeno: {counts['updated']}, dodato: {counts['added']}, "
+        f"obrisano: {counts['deleted']}"
+    )
+
+def refresh_data():
+    """Reload changed records from Excel file"""
+    if not reload_lock.acquire(blocking=False):
+        messagebox.showinfo("Osveženo", "Automatsko osvežavanje je u toku...")
+        return
+    try:
+        result = load_changes()
+        # Nothing to do if the file did not change since it was loaded
+        if result is None:
+            messagebox.showinfo("Osveženo", "Nema novih izmena.")
+        elif result["error"]:
+            messagebox.showerror("Greška", result["error"])
+        else:
+            messagebox.showinfo("Osveženo", apply_loaded(result))
+    finally:
+        reload_lock.release()
+
+def watcher_reload():
+    """Called by the file watcher thread - load and diff, then hand over to Tk"""
+    if not reload_lock.acquire(blocking=False):
+        return
+    try:
+        result = load_changes()
+    except Exception as e:
+        result = {"error": str(e)}
+    if result is None:
+        reload_lock.release()
+        return
+    reload_results.put(result)
+
+def poll_reload_results():
+    """Apply results of background reloads on the Tk thread"""
+    try:
+        try:
+            result = reload_results.get_nowait()
+        except queue.Empty:
+            return
+        try:
+            if result["error"]:
+                auto_refresh_var.set("Greška pri automatskom osvežavanju!")
+            else:
+                summary = apply_loaded(result).replace("\n\n", " ")
+                auto_refresh_var.set(f"{datetime.now().strftime('%H:%M:%S')} - {summary}")
+        finally:
+            reload_lock.release()
+    finally:
+        # Keep polling even if applying a reload failed
+        root.after(200, poll_reload_results)
 
 
 # Bind Enter key to search
 search_value_entry.bind('<Return>', lambda e: do_search())
+search_value_var.trace_add("write", schedule_live_search)
+search_field_menu.bind("<<ComboboxSelected>>", schedule_live_search)
+search_mode_menu.bind("<<ComboboxSelected>>", schedule_live_search)
+root.bind("<F12>", lambda e: show_search_stats())
 
 ttk.Button(inner_frame, text="Traži", command=do_search).pack(side=tk.LEFT, padx=(15, 5))
 ttk.Button(inner_frame, text="Sledeći", command=next_result).pack(side=tk.LEFT, padx=5)
@@ -235,6 +499,18 @@ ttk.Button(inner_frame, text="Osveži", command=refresh_data).pack(side=tk.LEFT,
 record_frame = ttk.Frame(root, padding=(10, 10), relief="flat", borderwidth=1)
 record_frame.pack(fill=tk.BOTH, padx=10, pady=0)
 
+# --- Side column: drawing preview and search results ---
+side_frame = ttk.Frame(root)
+side_frame.pack(before=record_frame, side=tk.RIGHT, fill=tk.Y, padx=(0, 10))
+
+# Click on the preview opens the drawing in the external viewer
+drawing_preview = DrawingPreview(side_frame, thumbnails, on_click=lambda: open_drawing())
+drawing_preview.frame.pack(side=tk.TOP, pady=(0, 10))
+
+# Search results are shown while there are any
+results_panel = ResultsPanel(side_frame, data, show_result, on_end=load_more_results,
+                             side=tk.TOP, fill=tk.BOTH, expand=True)
+
 entries = {}
 
 def make_entry(parent, label_text, field_name, width=30, ipady=0):
@@ -277,11 +553,12 @@ def open_drawing():
         messagebox.showinfo("Otvori crtež", "Broj crteža nije specificiran!")
         return
     
-    # Clean filename
-    filename = crtez.replace("/", "-").replace("\\", "-") + ".jpg"
-    path = os.path.join(DRAWINGS_FOLDER, filename)
+    # Clean filename, looked up in the index of the drawings folder
+    filename = drawing_file(crtez)
+    path = drawing_index.path(crtez)
     
-    if os.path.exists(path):
+    # Unchecked until the drawings folder has been read
+    if path and (drawing_index.ready or os.path.exists(path)):
         try:
             webbrowser.open(os.path.abspath(path))
         except Exception as e:
@@ -329,18 +606,25 @@ def prev_record():
         load_record(current_index - 1)
 
 def goto_record():
-    """Go to specific record number"""
+    """Go to specific record number or drawing number"""
     if not data:
         return
+    text = record_number_entry.get().strip()
     try:
-        idx = int(record_number_entry.get()) - 1
-        if 0 <= idx < len(data):
-            load_record(idx)
-        else:
-            messagebox.showwarning("Greška", 
-                                  f"Unesite broj između 1 i {len(data)}")
+        idx = int(text) - 1
     except ValueError:
-        messagebox.showwarning("Greška", "Unesite validan broj!")
+        # Not a record number - look the drawing number up in the key index
+        matches = search_cache.search("CRTEZBROJ", text, "exact")
+        if matches:
+            load_record(matches[0])
+        else:
+            messagebox.showwarning("Greška", f"Crtež '{text}' nije pronađen!")
+        return
+    if 0 <= idx < len(data):
+        load_record(idx)
+    else:
+        messagebox.showwarning("Greška", 
+                              f"Unesite broj između 1 i {len(data)}")
 
 def next_record_nav():
     """Go to next record"""
@@ -364,6 +648,36 @@ ttk.Button(nav_frame, text="Idi", command=goto_record).pack(side=tk.LEFT, padx=5
 ttk.Button(nav_frame, text="Sledeći >", command=next_record_nav).pack(side=tk.LEFT, padx=5)
 ttk.Button(nav_frame, text="Poslednji >>", command=last_record).pack(side=tk.LEFT, padx=5)
 
+# Table of all records, selecting a row loads it into the form
+record_table = RecordTable(root, data, FIELDS, load_record, title="Tabela crteža")
+ttk.Button(nav_frame, text="Tabela", 
+           command=lambda: record_table.open(current_index)).pack(side=tk.LEFT, padx=(15, 5))
+
+def drawings_report():
+    """Records without a drawing, drawings without a record and misnamed files"""
+    # Read the folder again so the report is up to date
+    success, error_msg = drawing_index.scan()
+    if not success:
+        messagebox.showerror("Greška", error_msg)
+        return
+    report = drawing_index.report(data)
+    show_report(root, "Provera crteža", format_report(report, DRAWINGS_FOLDER))
+
+ttk.Button(nav_frame, text="Provera crteža", command=drawings_report).pack(side=tk.LEFT, padx=5)
+
+# Automatic refresh status
+auto_refresh_var = tk.StringVar(value="")
+ttk.Label(nav_frame, textvariable=auto_refresh_var, anchor="e").pack(side=tk.RIGHT, padx=5)
+
+if WATCH_INTERVAL > 0:
+    watcher = FileWatcher(EXCEL_FILE, WATCH_INTERVAL, watcher_reload)
+    watcher.start()
+    # Added, removed or renamed drawings change the folder's mtime
+    drawings_watcher = FileWatcher(DRAWINGS_FOLDER, WATCH_INTERVAL, drawing_index.scan,
+                                   is_complete=lambda path: True)
+    drawings_watcher.start()
+    root.after(200, poll_reload_results)
+
 # --- Initialize ---
 if data:
     load_record(0)
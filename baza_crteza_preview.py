@@ -0,0 +1,301 @@
+import hashlib
+import os
+import queue
+import threading
+import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import ttk
+
+try:
+    from PIL import Image, ImageTk
+except ImportError:  # Without Pillow the pane only shows a notice
+    Image = ImageTk = None
+
+PREVIEW_SIZE = (380, 300)  # Thumbnails fit in this box (pixels)
+MEMORY_THUMBS = 64         # Thumbnails kept in memory
+THUMB_WORKERS = min(4, os.cpu_count() or 1)
+THUMB_QUALITY = 85         # JPEG quality of thumbnails on disk
+
+PREFETCH_DRAWINGS = 3                # Drawings warmed on each side of the current one
+PREFETCH_BYTES = 64 * 1024 * 1024    # Most bytes of drawings read by one prefetch
+
+
+def neighbours(items, pos, count=PREFETCH_DRAWINGS):
+    """Up to count items on each side of items[pos], nearest first, next before previous"""
+    nearby = []
+    for step in range(1, count + 1):
+        for n in (pos + step, pos - step):
+            if 0 <= n < len(items):
+                nearby.append(items[n])
+    return nearby
+
+
+class ThumbnailCache:
+    """Downscaled drawings, made on a thread pool
+
+    A thumbnail is keyed by path, mtime and size of the drawing, so a
+    rescanned drawing gets a new one. Thumbnails are kept in a memory LRU
+    and as JPEG files in folder (None for memory only), where the next start
+    finds them. Pillow releases the GIL while decoding, so the pool threads
+    run in parallel. Callbacks of request() and request_path() run on a
+    pool thread.
+
+    prefetch() warms the drawings around the current one. A planner thread
+    stats them (off the Tk thread, the share may be slow) and queues the
+    ones not cached yet until prefetch_bytes of drawings would be read.
+    The next prefetch() cancels whatever of it has not started.
+    """
+
+    def __init__(self, folder=None, size=PREVIEW_SIZE, memory_items=MEMORY_THUMBS,
+                 workers=THUMB_WORKERS, prefetch_bytes=PREFETCH_BYTES):
+        self.folder = folder
+        self.size = size
+        self.memory_items = memory_items
+        self.prefetch_bytes = prefetch_bytes
+        self._memory = OrderedDict()
+        self._pending = {}
+        self._prefetching = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+        self._planner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self.stats = {"memory": 0, "disk": 0, "decoded": 0, "prefetched": 0, "cancelled": 0}
+
+    @property
+    def available(self):
+        return Image is not None
+
+    def key(self, path):
+        """Cache key of a drawing, None if the file does not exist"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+    def get(self, key):
+        """Thumbnail from memory, None if it is not there"""
+        with self._lock:
+            image = self._memory.get(key)
+            if image is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory"] += 1
+        return image
+
+    def request(self, key, callback):
+        """Make the thumbnail for key on the pool, then callback(key, image, error)"""
+        with self._lock:
+            future = self._pending.get(key)
+            # Wanted now, a later prefetch() must not cancel it
+            self._prefetching.pop(key, None)
+            if future is None:
+                future = self._pool.submit(self._make, key)
+                self._pending[key] = future
+        future.add_done_callback(lambda f: callback(key, *f.result()))
+
+    def request_path(self, path, callback):
+        """Stat path on the pool, then make its thumbnail like request() and
+        callback(path, key, image, error); key is None if the file does not exist
+        """
+        self._pool.submit(self._lookup, path, callback)
+
+    def _lookup(self, path, callback):
+        key = self.key(path)
+        if key is None:
+            callback(path, None, None, None)
+            return
+        image = self.get(key)
+        if image is not None:
+            callback(path, key, image, None)
+            return
+        self.request(key, lambda key, image, error: callback(path, key, image, error))
+
+    def prefetch(self, paths):
+        """Make thumbnails of the drawings at paths (nearest first, None is
+        skipped) in the background, cancel queued ones of the last prefetch()
+        """
+        paths = [path for path in paths if path and self.available]
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            for key, future in self._prefetching.items():
+                if future.cancel():
+                    self._pending.pop(key, None)
+                    self.stats["cancelled"] += 1
+            self._prefetching = {}
+        if paths:
+            self._planner.submit(self._plan, generation, paths)
+
+    def _plan(self, generation, paths):
+        budget = self.prefetch_bytes
+        for path in paths:
+            if generation != self._generation:
+                return  # Navigation moved on
+            key = self.key(path)
+            if key is None:
+                continue
+            # Only drawings that are not on disk yet count against the budget
+            on_disk = bool(self.folder) and os.path.exists(self._disk_path(key))
+            # Checked and queued at once, a request() between them would be decoded twice
+            with self._lock:
+                if generation != self._generation:
+                    return
+                if key in self._memory or key in self._pending:
+                    continue
+                if not on_disk:
+                    if key[2] > budget:
+                        continue
+                    budget -= key[2]
+                future = self._pool.submit(self._make, key)
+                self._pending[key] = future
+                self._prefetching[key] = future
+                self.stats["prefetched"] += 1
+
+    def close(self):
+        self._planner.shutdown(wait=False, cancel_futures=True)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _make(self, key):
+        try:
+            image, error = self._load(key), None
+        except Exception as e:
+            image, error = None, f"Greška: {str(e)}"
+        with self._lock:
+            self._pending.pop(key, None)
+            self._prefetching.pop(key, None)
+            if image is not None:
+                self._memory[key] = image
+                self._memory.move_to_end(key)
+                while len(self._memory) > self.memory_items:
+                    self._memory.popitem(last=False)
+        return image, error
+
+    def _disk_path(self, key):
+        path, mtime, size = key
+        name = hashlib.blake2b(f"{path}\0{mtime}\0{size}\0{self.size}".encode("utf-8"),
+                               digest_size=16).hexdigest()
+        return os.path.join(self.folder, name + ".jpg")
+
+    def _load(self, key):
+        if self.folder:
+            try:
+                with Image.open(self._disk_path(key)) as image:
+                    thumb = image.copy()
+                with self._lock:
+                    self.stats["disk"] += 1
+                return thumb
+            except OSError:
+                pass
+
+        with Image.open(key[0]) as image:
+            image.thumbnail(self.size)  # JPEG is decoded at 1/2 to 1/8 scale
+            thumb = image.convert("L" if image.mode in ("1", "L") else "RGB")
+        with self._lock:
+            self.stats["decoded"] += 1
+        if self.folder:
+            self._save(key, thumb)
+        return thumb
+
+    def _save(self, key, thumb):
+        """Write the thumbnail to the disk cache, ignore errors (the cache is optional)"""
+        disk_path = self._disk_path(key)
+        tmp_path = f"{disk_path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            thumb.save(tmp_path, "JPEG", quality=THUMB_QUALITY)
+            os.replace(tmp_path, disk_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+class DrawingPreview:
+    """Pane that shows the thumbnail of the current drawing
+
+    show(path) never stats the drawing on the Tk thread (the share may be
+    slow): the ThumbnailCache looks it up on its pool and the thumbnail is
+    shown when it arrives, unless another drawing was shown meanwhile. A
+    thumbnail still in memory under the key last seen for the path is shown
+    at once and replaced if the file has changed. Results are picked up on the Tk thread by polling
+    with root.after while requests are outstanding. Clicking the pane calls
+    on_click() (opening the drawing in the external viewer).
+    """
+
+    def __init__(self, parent, cache, on_click=None, poll_ms=30):
+        self.cache = cache
+        self.poll_ms = poll_ms
+        self.frame = ttk.Frame(parent, width=cache.size[0] + 10, height=cache.size[1] + 10,
+                               relief="groove", borderwidth=1)
+        self.frame.pack_propagate(False)
+        self.label = ttk.Label(self.frame, anchor="center", justify="center")
+        self.label.pack(fill=tk.BOTH, expand=True)
+        if on_click is not None:
+            self.label.configure(cursor="hand2")
+            self.label.bind("<Button-1>", lambda e: on_click())
+        self.path = None
+        self.key = None
+        self._keys = {}  # Last key seen for a path
+        self._photo = None
+        self._results = queue.Queue()
+        self._outstanding = 0
+        self._text("")
+
+    def show(self, path):
+        """Show the drawing at path (None for a record without a drawing)"""
+        self.path = path
+        self.key = None
+        if path is None:
+            self._text("Nema crteža")
+            return
+        if not self.cache.available:
+            self._text("Pregled nije dostupan\n(potreban je paket Pillow)")
+            return
+        key = self._keys.get(path)
+        image = self.cache.get(key) if key is not None else None
+        if image is not None:
+            self.key = key
+            self._image(image)
+        else:
+            self._text("Učitavanje...")
+        if self._outstanding == 0:
+            self.frame.after(self.poll_ms, self._poll)
+        self._outstanding += 1
+        self.cache.request_path(path, lambda *result: self._results.put(result))
+
+    def _text(self, text):
+        self._photo = None
+        self.label.configure(image="", text=text)
+
+    def _image(self, image):
+        self._photo = ImageTk.PhotoImage(image)
+        self.label.configure(image=self._photo, text="")
+
+    def _poll(self):
+        while True:
+            try:
+                path, key, image, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._outstanding -= 1
+            if key is None:
+                self._keys.pop(path, None)
+            else:
+                if len(self._keys) >= 4 * self.cache.memory_items:
+                    self._keys.clear()
+                self._keys[path] = key
+            if path != self.path:
+                continue
+            if key is None:
+                self.key = None
+                self._text("Crtež nije pronađen")
+            elif key != self.key or image is None:
+                self.key = key
+                if image is not None:
+                    self._image(image)
+                else:
+                    self._text(f"Crtež nije moguće prikazati\n{error}")
+        if self._outstanding > 0:
+            self.frame.after(self.poll_ms, self._poll)
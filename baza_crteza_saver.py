@@ -0,0 +1,59 @@
+import queue
+import threading
+
+
+class BackgroundWorker:
+    """Run jobs (saves, live searches) one at a time on a worker thread
+
+    Jobs are submitted under a key. A job that is still waiting in the queue
+    is replaced by a newer job with the same key, so rapid successive saves
+    end up as a single write. Results are delivered to callbacks on the Tk
+    thread by polling with root.after; polling goes on if a callback raises.
+    """
+
+    def __init__(self, root, poll_ms=100):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._keys = queue.Queue()
+        self._results = queue.Queue()
+        self._waiting = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, key, job, callback=None):
+        """Queue job() -> (success, error), callback(success, error) runs on the Tk thread"""
+        with self._lock:
+            coalesced = key in self._waiting
+            self._waiting[key] = (job, callback)
+        if not coalesced:
+            self._keys.put(key)
+
+    def _run(self):
+        while True:
+            key = self._keys.get()
+            with self._lock:
+                job, callback = self._waiting.pop(key)
+            try:
+                result = job()
+            except Exception as e:
+                result = (False, f"Greška: {str(e)}")
+            self._results.put((callback, result))
+            self._keys.task_done()
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    callback, result = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                if callback:
+                    callback(*result)
+        finally:
+            self.root.after(self.poll_ms, self._poll)
+
+    def wait(self):
+        """Block until all queued jobs are finished (used when closing the app)"""
+        self._keys.join()
@@ -0,0 +1,1015 @@
+import re
+import shlex
+import threading
+from array import array
+from collections import OrderedDict
+from bisect import bisect_left, bisect_right, insort
+from itertools import accumulate
+
+_NON_WORD = re.compile(r"\W+")
+_WORD = re.compile(r"\w+")
+
+# Search modes offered in the search bar
+SEARCH_MODES = {"Sadrži": "contains", "Počinje sa": "prefix", "Tačno": "exact", "Približno": "fuzzy"}
+
+# Fields with a sorted index (exact and prefix lookup) and with a hash index (exact lookup)
+SORTED_KEY_FIELDS = ("CRTEZBROJ",)
+HASHED_KEY_FIELDS = ("IDENTBROJ",)
+
+# Operators of the query language (FIELD=value, FIELD^value, FIELD~value)
+QUERY_OPERATORS = {"=": "exact", "^": "prefix", "~": "contains"}
+_QUERY_TERM = re.compile(r"([A-Za-z0-9_]+\*?)([=^~])(.*)", re.S)
+_QUERY_TERM_NAME = re.compile(r"(?:^|\s)([A-Za-z0-9_]+\*?)[=^~]")
+
+# Fields with a deletion index for typo tolerant search, largest edit distance and number of results
+FUZZY_FIELDS = ("CRTEZBROJ", "KATALBROJ")
+FUZZY_MAX_DISTANCE = 2
+FUZZY_LIMIT = 20
+
+# Relevance ranked searches return at most this many records; below
+# RANK_INDEX_MAX trigram candidates they are ranked from the index
+RANK_LIMIT = 200
+RANK_INDEX_MAX = 5000
+
+# Results of this many queries are kept, lists longer than QUERY_CACHE_MAX_RESULTS are not.
+# An insert or delete drops a cached list instead of shifting more than QUERY_CACHE_MAX_SHIFT positions.
+QUERY_CACHE_SIZE = 64
+QUERY_CACHE_MAX_RESULTS = 50_000
+QUERY_CACHE_MAX_SHIFT = 10_000
+
+# Rebuild the trigram index when this many edits (and more than half the rows) left stale entries
+INDEX_REBUILD_MIN_STALE = 1000
+
+
+def normalize(s):
+    """Normalize string for comparison"""
+    if not s:
+        return ""
+    return _NON_WORD.sub("", str(s).lower())
+
+def trigrams(text):
+    """Distinct three-character substrings of a normalized value"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _pattern(text):
+    """Bit mask of positions for every character of text"""
+    peq = {}
+    for i, c in enumerate(text):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    return peq
+
+def _distance(peq, m, word):
+    """Levenshtein distance between the pattern (from _pattern, length m) and word
+
+    Bit-parallel algorithm (Myers/Hyyrö): one column of the DP table per
+    character of word, kept as bit vectors in Python ints.
+    """
+    if not m:
+        return len(word)
+    last = 1 << (m - 1)
+    full = (1 << m) - 1
+    pv, mv, score = full, 0, m
+    get = peq.get
+    for c in word:
+        eq = get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = (ph << 1) | 1
+        pv = ((mh << 1) | ~(xv | ph)) & full
+        mv = ph & xv
+    return score
+
+def edit_distance(a, b):
+    """Levenshtein distance between two strings"""
+    return _distance(_pattern(a), len(a), b)
+
+def fuzzy_budget(query):
+    """Edit distance allowed for a normalized query, one typo for short ones"""
+    return min(FUZZY_MAX_DISTANCE, max(1, len(query) // 4))
+
+def parse_query(text, fields, default_field, default_mode="contains"):
+    """Parse search bar text into terms (fields, mode, normalized value), returns (terms, error)
+
+    "FORMAT=A3 NAZIVDELA~vijak OBJEKAT*~kran" gives one term per word, all
+    of which have to match: = is exact, ^ prefix and ~ contains. A field
+    name ending in * stands for every field starting with it, any of which
+    may match. Values with spaces are quoted (NAZIVDELA~"vijak m8") and
+    words without an operator are searched in default_field. Only names of
+    fields count as terms ("M12=5" is a plain word); text without any of
+    them is a single term, as typed, for default_field.
+    """
+    if not any(_query_fields(name, fields) for name in _QUERY_TERM_NAME.findall(text)):
+        return [((default_field,), default_mode, normalize(text))], None
+    try:
+        words = shlex.split(text)
+    except ValueError:
+        return [], "Neispravan upit: navodnici nisu zatvoreni!"
+    terms = []
+    for word in words:
+        match = _QUERY_TERM.fullmatch(word)
+        matched = _query_fields(match.group(1), fields) if match else ()
+        if not matched:
+            # Fuzzy results are ranked, they cannot be combined with other terms
+            mode = "contains" if default_mode == "fuzzy" else default_mode
+            terms.append(((default_field,), mode, normalize(word)))
+            continue
+        terms.append((matched, QUERY_OPERATORS[match.group(2)], normalize(match.group(3))))
+    return terms, None
+
+def _query_fields(name, fields):
+    """Fields a field name of a query term stands for, () if it is not a field"""
+    name = name.upper()
+    if name.endswith("*"):
+        return tuple(f for f in fields if f.startswith(name[:-1]))
+    return (name,) if name in fields else ()
+
+def ranked_query(terms):
+    """Whether query() returns terms in an order other than data order (contains
+    by relevance, fuzzy results closest first, exact and prefix CRTEZBROJ by
+    drawing number)
+    """
+    fields, mode, _ = terms[0]
+    return len(terms) == 1 and len(fields) == 1 and (
+        mode in ("contains", "fuzzy") or fields[0] in SORTED_KEY_FIELDS)
+
+def word_starts(value):
+    """Offsets in normalize(value) where words of value start"""
+    starts = set()
+    pos = 0
+    for word in _WORD.findall(str(value).lower()):
+        starts.add(pos)
+        pos += len(word)
+    return starts
+
+def result_count(results):
+    """Number of results for the counter, "200+" if a ranked search stopped early"""
+    return f"{len(results)}+" if getattr(results, "more", False) else str(len(results))
+
+
+class RankedResults(list):
+    """Record indexes, best first; more is set if there were more matches
+    (SearchCache.next_page() gets them for the field and query of the search).
+    candidates holds all matches in data order when the search saw them all
+    (SearchCache.refine() ranks a longer query from them), None otherwise.
+    """
+
+    more = False
+    field = None
+    query = ""
+    candidates = None
+
+    def copy(self):
+        results = RankedResults(self)
+        results.__dict__.update(self.__dict__)
+        return results
+
+def _term_matches(mode, query):
+    """Test for one normalized value"""
+    if mode == "exact":
+        return query.__eq__
+    if mode == "prefix":
+        return lambda value: value.startswith(query)
+    return lambda value: query in value
+
+def _narrows(mode, previous, query):
+    """Whether every value matching query also matches previous"""
+    if mode == "contains":
+        return previous in query
+    if mode == "prefix":
+        return query.startswith(previous)
+    return mode == "exact" and previous == query
+
+def _field_values(data, field):
+    """All values of a field, from a RecordStore column or a list of dicts"""
+    if hasattr(data, "column"):
+        return data.column(field)
+    return [rec.get(field) for rec in data]
+
+
+class TrigramIndex:
+    """Inverted index per field from trigrams of normalized values to record ids
+
+    Posting lists only grow: a changed or deleted record leaves its old
+    entries behind, so candidates() is a superset that has to be verified.
+    """
+
+    def __init__(self, fields):
+        self.postings = {f: {} for f in fields}
+
+    def add_values(self, field, ids, values):
+        """Index normalized values of a field for the given record ids"""
+        # Group ids by value first, most fields repeat a few values many times
+        groups = {}
+        for rec_id, value in zip(ids, values):
+            if len(value) >= 3:
+                group = groups.get(value)
+                if group is None:
+                    groups[value] = [rec_id]
+                else:
+                    group.append(rec_id)
+        postings = self.postings[field]
+        for value, group in groups.items():
+            for gram in trigrams(value):
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array("I")
+                posting.extend(group)
+
+    def add(self, rec_id, values):
+        """Index one record from a dict of normalized values"""
+        for field, value in values.items():
+            self.add_values(field, (rec_id,), (value,))
+
+    def candidates(self, field, query):
+        """Ids of records that may contain query, None if the field is not indexed"""
+        postings = self.postings.get(field)
+        if postings is None or len(query) < 3:
+            return None
+        lists = []
+        for gram in trigrams(query):
+            posting = postings.get(gram)
+            if posting is None:
+                return set()
+            lists.append(posting)
+        lists.sort(key=len)
+        candidates = set(lists[0])
+        # Intersect only while it is cheaper than verifying the candidates
+        for posting in lists[1:]:
+            if len(posting) > 8 * len(candidates):
+                break
+            candidates.intersection_update(posting)
+        return candidates
+
+    def estimate(self, field, query):
+        """Upper bound for the number of records containing query, None if unknown"""
+        postings = self.postings.get(field)
+        if postings is None or len(query) < 3:
+            return None
+        return min(len(postings.get(gram, ())) for gram in trigrams(query))
+
+
+def _deletions(value):
+    """value and every string made by deleting one of its characters"""
+    variants = {value[:i] + value[i + 1:] for i in range(len(value))}
+    variants.add(value)
+    return variants
+
+
+class DeletionIndex:
+    """Distinct normalized values found by their one-character deletions
+
+    Two values share an entry when deleting at most one character from each
+    makes them equal, which finds every value within one edit of a query.
+    For two edits the query side also gets one more edit - another deletion,
+    or a character of the field's alphabet replaced or inserted - so a
+    lookup costs a few thousand probes however many values there are.
+
+    Entries live in an open-addressing hash table in one array: the hash of
+    the deletion in the high bits and the value number in the low bits.
+    Record ids of each value are kept next to it; like the trigram postings
+    they only grow and results have to be verified.
+    """
+
+    VALUE_BITS = 24
+    HASH_MASK = (1 << 39) - 1
+
+    def __init__(self, size=1024):
+        self.table = array("q", bytes(8 * size))
+        self.used = 0
+        self.values = [None]
+        self.ids = {}
+        self.alphabet = set()
+
+    def _put(self, entry):
+        table = self.table
+        mask = len(table) - 1
+        slot = (entry >> self.VALUE_BITS) & mask
+        while table[slot]:
+            slot = (slot + 1) & mask
+        table[slot] = entry
+        self.used += 1
+
+    def _grow(self):
+        entries = [entry for entry in self.table if entry]
+        self.table = array("q", bytes(16 * len(self.table)))
+        self.used = 0
+        for entry in entries:
+            self._put(entry)
+
+    def add(self, rec_id, value):
+        if not value:
+            return
+        ids = self.ids.get(value)
+        if ids is not None:
+            ids.append(rec_id)
+            return
+        self.ids[value] = array("I", (rec_id,))
+        self.alphabet.update(value)
+        number = len(self.values)
+        self.values.append(value)
+        variants = _deletions(value)
+        while (self.used + len(variants)) * 10 > len(self.table) * 7:
+            self._grow()
+        for variant in variants:
+            self._put(((hash(variant) & self.HASH_MASK) << self.VALUE_BITS) | number)
+
+    def add_values(self, ids, values):
+        for rec_id, value in zip(ids, values):
+            self.add(rec_id, value)
+
+    def candidates(self, query, max_distance=1):
+        """Values that may be within max_distance (1 or 2) edits of query"""
+        variants = _deletions(query)
+        if max_distance > 1:
+            alphabet = self.alphabet
+            for base in list(variants):
+                variants.update(_deletions(base))
+                for i in range(len(base) + 1):
+                    head, tail, rest = base[:i], base[i:], base[i + 1:]
+                    for c in alphabet:
+                        variants.add(head + c + tail)
+                        if tail:
+                            variants.add(head + c + rest)
+        table = self.table
+        mask = len(table) - 1
+        value_mask = (1 << self.VALUE_BITS) - 1
+        numbers = set()
+        for variant in variants:
+            key = hash(variant) & self.HASH_MASK
+            slot = key & mask
+            entry = table[slot]
+            while entry:
+                if entry >> self.VALUE_BITS == key:
+                    numbers.add(entry & value_mask)
+                slot = (slot + 1) & mask
+                entry = table[slot]
+        return [self.values[number] for number in numbers]
+
+
+class SortedKeyIndex:
+    """(normalized value, record id) pairs kept sorted for exact and prefix lookup"""
+
+    def __init__(self, ids, values):
+        self.keys = dict(zip(ids, values))
+        self.entries = sorted(zip(values, ids))
+
+    def add(self, rec_id, value):
+        self.remove(rec_id)
+        self.keys[rec_id] = value
+        insort(self.entries, (value, rec_id))
+
+    def remove(self, rec_id):
+        value = self.keys.pop(rec_id, None)
+        if value is not None:
+            del self.entries[bisect_left(self.entries, (value, rec_id))]
+
+    def lookup(self, query, prefix=False):
+        """Ids with value equal to (or starting with) query, in value order"""
+        entries = self.entries
+        i = bisect_left(entries, (query,))
+        ids = []
+        while i < len(entries):
+            value, rec_id = entries[i]
+            if value != query and not (prefix and value.startswith(query)):
+                break
+            ids.append(rec_id)
+            i += 1
+        return ids
+
+
+class HashKeyIndex:
+    """Normalized value -> record ids, for exact lookup only"""
+
+    def __init__(self, ids, values):
+        self.keys = {}
+        self.ids = {}
+        for rec_id, value in zip(ids, values):
+            self.add(rec_id, value)
+
+    def add(self, rec_id, value):
+        self.remove(rec_id)
+        self.keys[rec_id] = value
+        self.ids.setdefault(value, []).append(rec_id)
+
+    def remove(self, rec_id):
+        value = self.keys.pop(rec_id, None)
+        if value is not None:
+            ids = self.ids[value]
+            ids.remove(rec_id)
+            if not ids:
+                del self.ids[value]
+
+    def lookup(self, query, prefix=False):
+        if prefix:
+            return None
+        return list(self.ids.get(query, ()))
+
+
+class SearchCache:
+    """Normalized field values kept next to data, built lazily per field
+
+    Each searched field gets a list of normalized values (built on the first
+    search) and a joined text of them that a query is found in with str.find.
+    Scripts report edits with update/insert/delete so the lists stay in step
+    with data; the joined text is rebuilt on the next search after an edit.
+
+    After start_index() a TrigramIndex (and a DeletionIndex for each of
+    FUZZY_FIELDS) is built on a background thread and used for queries of
+    three or more characters once it is ready. Records
+    are identified there by ids that do not move when rows are inserted or
+    deleted.
+
+    Exact and prefix searches on CRTEZBROJ and IDENTBROJ use key indexes
+    built on the first such search.
+
+    query() combines terms on several fields (see parse_query()), starting
+    from the term an index narrows down the most. Its results are kept in
+    an LRU cache that edits patch in place; stats counts hits and misses.
+
+    Edits must come from the thread that created the cache. Searches may
+    run on another thread after prepare(); they only read, and version
+    (bumped after every edit) tells whether their result is still current.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self._values = {}
+        self._joined = {}
+        self._keys = {}
+        self._ids = list(range(len(data)))
+        self._next_id = len(data)
+        self._positions = None
+        self._positions_version = -1
+        self.version = 0
+        self._owner = threading.get_ident()
+        self._index_fields = None
+        self._index = None
+        self._fuzzy = {}
+        self._pending = None
+        self._stale = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "patched": 0, "dropped": 0}
+
+    def reset(self, data=None):
+        """Drop everything (after data was reloaded), rebuild the index if used"""
+        if data is not None:
+            self.data = data
+        self._values.clear()
+        self._joined.clear()
+        self._keys.clear()
+        self._ids = list(range(len(self.data)))
+        self._next_id = len(self.data)
+        self._positions = None
+        self.stats["dropped"] += len(self._results)
+        self._results.clear()
+        with self._lock:
+            self._index = None
+            self._fuzzy = {}
+            self._pending = None
+        self.version += 1
+        if self._index_fields is not None:
+            self.start_index(self._index_fields)
+
+    def values(self, field):
+        """Normalized values of a field in data order"""
+        values = self._values.get(field)
+        if values is None:
+            values = [normalize(v) for v in _field_values(self.data, field)]
+            # Only the owning thread keeps it, edits would not reach a list built elsewhere
+            if threading.get_ident() == self._owner:
+                self._values[field] = values
+        return values
+
+    def update(self, idx):
+        """Record at idx was changed"""
+        rec = self.data[idx]
+        changed = set()
+        for field, values in self._values.items():
+            value = normalize(rec.get(field))
+            if values[idx] != value:
+                values[idx] = value
+                changed.add(field)
+        self._joined.clear()
+        self._index_keys(idx)
+        self._index_record(idx)
+        self._patch_results(idx, 0, changed)
+        self.version += 1
+        self._add_stale()
+
+    def insert(self, idx):
+        """Record was inserted at idx (or appended)"""
+        rec = self.data[idx]
+        for field, values in self._values.items():
+            values.insert(idx, normalize(rec.get(field)))
+        self._joined.clear()
+        self._ids.insert(idx, self._next_id)
+        self._next_id += 1
+        appended = idx == len(self._ids) - 1 and self._positions_version == self.version
+        self._index_keys(idx)
+        self._index_record(idx)
+        self._patch_results(idx, 1)
+        self.version += 1
+        if appended:
+            self._positions[self._ids[idx]] = idx
+            self._positions_version = self.version
+
+    def delete(self, idx):
+        """Record at idx was removed"""
+        for values in self._values.values():
+            del values[idx]
+        self._joined.clear()
+        for index in self._keys.values():
+            index.remove(self._ids[idx])
+        del self._ids[idx]
+        self._patch_results(idx, -1)
+        self.version += 1
+        self._add_stale()
+
+    # --- Query results ---
+
+    def cached(self, terms):
+        """Cached results of a query() of terms (a copy), None on a miss"""
+        entry = self._results.get(tuple(terms))
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        self._results.move_to_end(tuple(terms))
+        self.stats["hits"] += 1
+        return entry[0].copy()
+
+    def remember(self, terms, results):
+        """Keep results of a query() of terms made at the current version"""
+        if len(results) > QUERY_CACHE_MAX_RESULTS:
+            return
+        # Fuzzy and drawing number order cannot be patched by position
+        self._results[tuple(terms)] = (results.copy(), ranked_query(terms))
+        self._results.move_to_end(tuple(terms))
+        if len(self._results) > QUERY_CACHE_SIZE:
+            self._results.popitem(last=False)
+
+    def _patch_results(self, idx, shift, changed=None):
+        """Bring cached results up to date after the record at idx was updated
+        (shift 0, only fields in changed matter), inserted (1) or deleted (-1)
+        """
+        for terms, (results, ranked) in list(self._results.items()):
+            if changed is not None and not changed.intersection(f for term in terms for f in term[0]):
+                continue
+            pos = bisect_left(results, idx)
+            if ranked or (shift and len(results) - pos > QUERY_CACHE_MAX_SHIFT):
+                del self._results[terms]
+                self.stats["dropped"] += 1
+                continue
+            present = pos < len(results) and results[pos] == idx
+            if shift < 0 and present:
+                del results[pos]
+            if shift:
+                results[pos:] = [i + shift for i in results[pos:]]
+                present = False
+            if shift >= 0:
+                matches = bool(self._filter(terms, [idx]))
+                if matches and not present:
+                    results.insert(pos, idx)
+                elif present and not matches:
+                    del results[pos]
+            self.stats["patched"] += 1
+
+    # --- Key indexes ---
+
+    def _key_index(self, field):
+        index = self._keys.get(field)
+        if index is None:
+            if field in SORTED_KEY_FIELDS:
+                index_class = SortedKeyIndex
+            elif field in HASHED_KEY_FIELDS:
+                index_class = HashKeyIndex
+            else:
+                return None
+            index = index_class(self._ids, self.values(field))
+            if threading.get_ident() == self._owner:
+                self._keys[field] = index
+        return index
+
+    def _index_keys(self, idx):
+        for field, index in self._keys.items():
+            index.add(self._ids[idx], self._values[field][idx])
+
+    # --- Trigram index ---
+
+    def start_index(self, fields):
+        """Build the trigram index over fields on a background thread"""
+        self._index_fields = list(fields)
+        self._generation += 1
+        # Snapshot on the calling thread, edits made during the build are queued
+        columns = {f: _field_values(self.data, f) for f in self._index_fields}
+        with self._lock:
+            self._pending = []
+        threading.Thread(
+            target=self._build_index,
+            args=(self._generation, list(self._ids), columns),
+            daemon=True,
+        ).start()
+
+    def _build_index(self, generation, ids, columns):
+        index = TrigramIndex(columns)
+        fuzzy = {}
+        for field, raw_values in columns.items():
+            if generation != self._generation:
+                return
+            values = list(map(normalize, raw_values))
+            index.add_values(field, ids, values)
+            if field in FUZZY_FIELDS:
+                fuzzy[field] = DeletionIndex()
+                fuzzy[field].add_values(ids, values)
+        with self._lock:
+            if generation != self._generation:
+                return
+            for rec_id, values in self._pending:
+                index.add(rec_id, values)
+                for field, deletions in fuzzy.items():
+                    deletions.add(rec_id, values[field])
+            self._pending = None
+            self._index = index
+            self._fuzzy = fuzzy
+            self._stale = 0
+
+    def index_ready(self):
+        return self._index is not None
+
+    def _index_record(self, idx):
+        if self._index_fields is None:
+            return
+        rec = self.data[idx]
+        entry = (self._ids[idx], {f: normalize(rec.get(f)) for f in self._index_fields})
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(entry)
+            if self._index is not None:
+                self._index.add(*entry)
+            for field, deletions in self._fuzzy.items():
+                deletions.add(entry[0], entry[1][field])
+
+    def _add_stale(self):
+        """An edit left entries behind in the index, rebuild once there are many"""
+        self._stale += 1
+        if (self._index_fields is not None and self._pending is None
+                and self._stale > max(INDEX_REBUILD_MIN_STALE, len(self._ids) // 2)):
+            self.start_index(self._index_fields)
+
+    def _id_positions(self):
+        if self._positions_version != self.version:
+            # Stamp with the version from before the build, an edit during it makes it stale
+            version = self.version
+            self._positions = {rec_id: idx for idx, rec_id in enumerate(self._ids)}
+            self._positions_version = version
+        return self._positions
+
+    # --- Search ---
+
+    def _joined_values(self, field):
+        joined = self._joined.get(field)
+        if joined is None or joined[0] != self.version:
+            version = self.version
+            values = self.values(field)
+            # Normalized values never contain "\n", so it separates them safely
+            # (also before the first and after the last value)
+            text = "\n" + "\n".join(values) + "\n"
+            starts = list(accumulate((len(v) + 1 for v in values), initial=1))
+            joined = self._joined[field] = (version, text, starts)
+        return joined[1], joined[2]
+
+    def _index_search(self, field, query):
+        index = self._index
+        if index is None:
+            return None
+        candidates = index.candidates(field, query)
+        if candidates is None:
+            return None
+        values = self.values(field)
+        positions = self._id_positions()
+        found = (positions.get(rec_id) for rec_id in candidates)
+        return sorted(idx for idx in found if idx is not None and query in values[idx])
+
+    def _key_search(self, field, query, prefix):
+        index = self._key_index(field)
+        ids = index.lookup(query, prefix) if index is not None else None
+        if ids is not None:
+            positions = self._id_positions()
+            found = [positions[rec_id] for rec_id in ids]
+            return found if isinstance(index, SortedKeyIndex) else sorted(found)
+        values = self.values(field)
+        if prefix:
+            return [i for i, value in enumerate(values) if value.startswith(query)]
+        return [i for i, value in enumerate(values) if value == query]
+
+    def _fuzzy_search(self, field, query):
+        budget = fuzzy_budget(query)
+        peq = _pattern(query)
+        values = self.values(field)
+        found = []
+        index = self._fuzzy.get(field)
+        if index is not None:
+            positions = self._id_positions()
+            for value in index.candidates(query, budget):
+                distance = _distance(peq, len(query), value)
+                if distance > budget:
+                    continue
+                # A record saved again without changes is listed twice
+                for rec_id in set(index.ids[value]):
+                    idx = positions.get(rec_id)
+                    if idx is not None and values[idx] == value:
+                        found.append((distance, idx))
+        else:
+            # No index for this field (or not built yet) - compare with every distinct value
+            distances = {}
+            for idx, value in enumerate(values):
+                distance = distances.get(value)
+                if distance is None:
+                    distance = distances[value] = _distance(peq, len(query), value) if value else budget + 1
+                if distance <= budget:
+                    found.append((distance, idx))
+        found.sort()
+        return [idx for _, idx in found[:FUZZY_LIMIT]]
+
+    def prepare(self, terms):
+        """Build what a query() of terms needs, so that it can run on another thread"""
+        for fields, mode, _ in terms:
+            for field in fields:
+                self.values(field)
+                if mode == "contains":
+                    self._joined_values(field)
+                elif mode != "fuzzy":
+                    self._key_index(field)
+        self._id_positions()
+
+    def refine(self, previous_terms, previous, terms, cancelled=None):
+        """Results for terms computed from the results of previous_terms, if terms
+        narrow them down (None otherwise or when cancelled)
+
+        Ranked contains results are refined from their candidates and ranked
+        again, the ranks depend on the whole query.
+        """
+        if len(previous_terms) != len(terms):
+            return None
+        for (fields, mode, query), (new_fields, new_mode, new_query) in zip(previous_terms, terms):
+            if fields != new_fields or mode != new_mode or not _narrows(mode, query, new_query):
+                return None
+        if ranked_query(terms) and terms[0][1] == "contains":
+            candidates = getattr(previous, "candidates", None)
+            if candidates is None:
+                return None
+            matches = self._filter(terms, candidates, cancelled)
+            if matches is None:
+                return None
+            return self._ranked_matches(terms[0][0][0], terms[0][2], matches)
+        return self._filter(terms, previous, cancelled)
+
+    def _filter(self, terms, results, cancelled=None):
+        """Results that match all terms, in the same order"""
+        tests = [([self.values(f) for f in fields], _term_matches(mode, query))
+                 for fields, mode, query in terms]
+        filtered = []
+        for n, idx in enumerate(results):
+            if cancelled is not None and n % 4096 == 4095 and cancelled():
+                return None
+            for columns, test in tests:
+                if not any(test(values[idx]) for values in columns):
+                    break
+            else:
+                filtered.append(idx)
+        return filtered
+
+    def _estimate(self, term):
+        """Estimated number of matches of a term and its result if that was cheap to get"""
+        fields, mode, query = term
+        total = 0
+        results = []
+        for field in fields:
+            index = self._key_index(field) if mode in ("exact", "prefix") else None
+            if index is not None and (mode == "exact" or isinstance(index, SortedKeyIndex)):
+                found = self._key_search(field, query, mode == "prefix")
+                total += len(found)
+                if results is not None:
+                    results.extend(found)
+                continue
+            results = None
+            estimate = None
+            if mode == "contains" and self._index is not None:
+                estimate = self._index.estimate(field, query)
+            total += len(self._ids) if estimate is None else estimate
+        return total, results
+
+    def query(self, terms, cancelled=None):
+        """Indexes of records matching every term from parse_query()
+
+        A single term on one field is a plain search() (ranked() for
+        contains). Otherwise the term
+        expected to match the fewest records goes first, found with a key or
+        trigram index when there is one (a scan otherwise), and the others
+        only test its results. Results are in data order. Returns None if
+        cancelled() becomes true.
+
+        On the thread that owns the cache results come from (and go to) the
+        query result cache.
+        """
+        if threading.get_ident() != self._owner:
+            return self._query(terms, cancelled)
+        results = self.cached(terms)
+        if results is None:
+            results = self._query(terms, cancelled)
+            if results is not None:
+                self.remember(terms, results)
+        return results
+
+    def _query(self, terms, cancelled=None):
+        if len(terms) == 1 and len(terms[0][0]) == 1:
+            fields, mode, query = terms[0]
+            if mode == "contains":
+                return self.ranked(fields[0], query, cancelled=cancelled)
+            return self.search(fields[0], query, mode, cancelled)
+        plan = sorted(((self._estimate(term), n, term) for n, term in enumerate(terms)),
+                      key=lambda item: (item[0][0], item[1]))
+        (_, results), _, first = plan[0]
+        if results is None:
+            found = set()
+            for field in first[0]:
+                matches = self.search(field, first[2], first[1], cancelled)
+                if matches is None:
+                    return None
+                found.update(matches)
+            results = found
+        return self._filter([term for _, _, term in plan[1:]], sorted(set(results)), cancelled)
+
+    def _occurrences(self, field, pattern):
+        """Indexes of records whose value (between separators) contains pattern,
+        which starts with the separator before the value
+        """
+        text, starts = self._joined_values(field)
+        find = text.find
+        pos = find(pattern)
+        while pos != -1:
+            idx = bisect_right(starts, pos + 1) - 1
+            yield idx
+            pos = find(pattern, starts[idx + 1] - 1)
+
+    def rank(self, field, idx, query):
+        """Where the normalized query is in field of record idx: 0 exact,
+        1 prefix, 2 at the start of a word, 3 elsewhere
+        """
+        value = self.values(field)[idx]
+        if value == query:
+            return 0
+        if value.startswith(query):
+            return 1
+        starts = word_starts(self.data[idx].get(field))
+        pos = value.find(query)
+        while pos != -1:
+            if pos in starts:
+                return 2
+            pos = value.find(query, pos + 1)
+        return 3
+
+    def ranked(self, field, query, limit=RANK_LIMIT, cancelled=None):
+        """Best limit records whose field contains the normalized query
+
+        Exact matches come first, then values starting with the query, then
+        values with a word starting with it, then the rest, in data order
+        within each rank. Exact and prefix matches are found first, so a
+        broad query stops as soon as limit of them are known; otherwise only
+        the best limit matches seen so far are kept. Returns RankedResults
+        (more is set if matches were left out, candidates if all of at most
+        RANK_INDEX_MAX matches were seen), None if cancelled.
+        """
+        query = normalize(query)
+        values = self.values(field)
+        results = RankedResults()
+        results.field, results.query = field, query
+        if not query:
+            results.extend(range(min(limit, len(values))))
+            results.more = len(values) > limit
+            return results
+        index = self._index
+        if index is not None and (index.estimate(field, query) or 0) <= RANK_INDEX_MAX:
+            matches = self._index_search(field, query)
+            if matches is not None:
+                return self._ranked_matches(field, query, matches, limit)
+
+        # One list per rank, never more than limit + 1 records in all
+        ranks = ([], [], [], [])
+        kept = 0
+        # Every match in data order (the last pass sees them all unless it stops early)
+        seen = []
+        passes = (
+            (0, self._occurrences(field, "\n" + query + "\n")),
+            (1, self._occurrences(field, "\n" + query)),
+            (2, self._contains(field, query)),
+        )
+        for best, matches in passes:
+            for n, idx in enumerate(matches):
+                if cancelled is not None and n % 4096 == 4095 and cancelled():
+                    return None
+                if kept > limit:
+                    worst = max(rank for rank in range(4) if ranks[rank])
+                    if worst <= best:
+                        seen = None
+                        break  # Nothing better can come from here on
+                if best == 2 and seen is not None:
+                    seen.append(idx)
+                    if len(seen) > RANK_INDEX_MAX:
+                        seen = None
+                rank = self.rank(field, idx, query)
+                if rank < best:
+                    continue  # Found by an earlier pass
+                if kept > limit:
+                    if rank >= worst:
+                        continue
+                    ranks[worst].pop()
+                    kept -= 1
+                ranks[rank].append(idx)
+                kept += 1
+        for hits in ranks:
+            results.extend(hits)
+        results.more = len(results) > limit
+        del results[limit:]
+        results.candidates = seen
+        return results
+
+    def _ranked_matches(self, field, query, matches, limit=RANK_LIMIT):
+        """RankedResults of a ranked() search from all its matches (in data order)
+
+        Exact and prefix matches are told apart by comparing values, word
+        starts are only looked for while there is room left for them.
+        """
+        values = self.values(field)
+        exact, prefix, rest = [], [], []
+        for idx in matches:
+            value = values[idx]
+            if value == query:
+                exact.append(idx)
+            elif value.startswith(query):
+                prefix.append(idx)
+            else:
+                rest.append(idx)
+        best = exact + prefix
+        words, others = [], []
+        for idx in rest:
+            if len(best) + len(words) >= limit:
+                break
+            (words if self.rank(field, idx, query) == 2 else others).append(idx)
+        results = RankedResults((best + words + others)[:limit])
+        results.field, results.query = field, query
+        results.more = len(matches) > limit
+        results.candidates = matches
+        return results
+
+    def next_page(self, results, page=RANK_LIMIT):
+        """results of ranked() with up to page more records at the end
+
+        The same search with a higher limit, so the records already shown
+        keep their places.
+        """
+        return self.ranked(results.field, results.query, limit=len(results) + page)
+
+    def _contains(self, field, query):
+        """Indexes of records whose normalized value contains query, in data order"""
+        text, starts = self._joined_values(field)
+        find = text.find
+        pos = find(query)
+        while pos != -1:
+            idx = bisect_right(starts, pos) - 1
+            yield idx
+            # Continue after this record, one hit per record is enough
+            pos = find(query, starts[idx + 1])
+
+    def search(self, field, query, mode="contains", cancelled=None):
+        """Indexes of records whose field contains the normalized query
+
+        mode "exact" and "prefix" match the whole value or its start instead;
+        CRTEZBROJ results then come in drawing number order. mode "fuzzy"
+        returns the closest values within fuzzy_budget() edits, closest
+        first (at most FUZZY_LIMIT records). Returns None if
+        cancelled() becomes true during a long scan.
+        """
+        query = normalize(query)
+        if mode == "fuzzy":
+            return self._fuzzy_search(field, query) if query else []
+        if mode != "contains":
+            return self._key_search(field, query, mode == "prefix")
+        if not query:
+            return list(range(len(self.values(field))))
+        results = self._index_search(field, query)
+        if results is not None:
+            return results
+        results = []
+        for idx in self._contains(field, query):
+            if cancelled is not None and len(results) % 4096 == 4095 and cancelled():
+                return None
+            results.append(idx)
+        return results
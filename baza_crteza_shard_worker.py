@@ -0,0 +1,61 @@
+"""Worker process of ShardedSearch: one shard of records and a SearchCache over it
+
+Started by baza_crteza_shards as a plain script, so it never imports the
+GUI scripts. Tasks come as pickled (name, args) on stdin, every result goes
+back as pickled (success, result or error text) on stdout, in task order.
+"""
+import pickle
+import sys
+
+from baza_crteza_search import SearchCache
+from baza_crteza_store import RecordStore
+
+_shard = None
+
+def load(fields, rows):
+    global _shard
+    data = RecordStore(fields, (dict(zip(fields, row)) for row in rows))
+    _shard = SearchCache(data)
+    _shard.start_index(fields)
+    return len(data)
+
+def query(terms):
+    return _shard.query(terms)
+
+def ranked(field, query, limit):
+    results = _shard.ranked(field, query, limit)
+    return ([(_shard.rank(field, idx, results.query), idx) for idx in results],
+            results.more, results.candidates)
+
+def update(idx, record):
+    _shard.data[idx].update(record)
+    _shard.update(idx)
+
+def insert(idx, record):
+    _shard.data.insert(idx, record)
+    _shard.insert(idx)
+
+def delete(idx):
+    del _shard.data[idx]
+    _shard.delete(idx)
+
+TASKS = {fn.__name__: fn for fn in (load, query, ranked, update, insert, delete)}
+
+
+def main():
+    tasks, results = sys.stdin.buffer, sys.stdout.buffer
+    sys.stdout = sys.stderr  # Only results go to the parent
+    while True:
+        try:
+            name, args = pickle.load(tasks)
+        except EOFError:
+            return  # The parent closed the pipe
+        try:
+            result = (True, TASKS[name](*args))
+        except Exception as e:
+            result = (False, f"{type(e).__name__}: {str(e)}")
+        pickle.dump(result, results, protocol=pickle.HIGHEST_PROTOCOL)
+        results.flush()
+
+if __name__ == "__main__":
+    main()
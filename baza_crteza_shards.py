@@ -0,0 +1,269 @@
+import os
+import pickle
+import queue
+import subprocess
+import sys
+import threading
+from collections import deque
+from concurrent.futures import Future
+from itertools import accumulate
+
+from baza_crteza_search import RANK_INDEX_MAX, RANK_LIMIT, RankedResults, normalize, ranked_query
+
+# Largest number of worker processes (one shard each)
+MAX_SHARDS = 8
+
+# Started as a script, so the worker never imports the GUI script that started it
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baza_crteza_shard_worker.py")
+
+
+class _ShardProcess:
+    """One worker process running baza_crteza_shard_worker tasks in order
+
+    submit() returns a Future. A writer thread sends the tasks (a shard's
+    records can take a while to pipe) and a reader thread resolves the
+    futures as results come back, so the Tk thread never waits on a pipe.
+    """
+
+    def __init__(self):
+        self._process = subprocess.Popen([sys.executable, WORKER_SCRIPT],
+                                         stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self._tasks = queue.Queue()
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._closed = False
+        threading.Thread(target=self._write, daemon=True).start()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def submit(self, name, *args):
+        future = Future()
+        with self._lock:
+            if self._closed:
+                future.set_exception(RuntimeError("Proces za pretragu je zaustavljen"))
+                return future
+            self._pending.append(future)
+            self._tasks.put((name, args))
+        return future
+
+    def shutdown(self):
+        """Stop after the running task, cancel the queued ones"""
+        with self._lock:
+            self._closed = True
+            pending, self._pending = self._pending, deque()
+            self._tasks.put(None)
+        for future in pending:
+            future.cancel()
+
+    def _write(self):
+        pipe = self._process.stdin
+        try:
+            while True:
+                task = self._tasks.get()
+                if task is None:
+                    break
+                pickle.dump(task, pipe, protocol=pickle.HIGHEST_PROTOCOL)
+                pipe.flush()
+        except OSError:
+            pass  # The worker is gone, the reader fails the futures
+        finally:
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+    def _read(self):
+        pipe = self._process.stdout
+        while True:
+            try:
+                success, result = pickle.load(pipe)
+            except (EOFError, OSError, pickle.UnpicklingError):
+                break
+            with self._lock:
+                future = self._pending.popleft() if self._pending else None
+            if future is None or future.cancelled():
+                continue
+            if success:
+                future.set_result(result)
+            else:
+                future.set_exception(RuntimeError(result))
+        # Worker exited, nothing more will come back
+        with self._lock:
+            self._closed = True
+            pending, self._pending = self._pending, deque()
+        for future in pending:
+            if not future.cancelled():
+                future.set_exception(RuntimeError("Proces za pretragu se neočekivano zatvorio"))
+        self._process.wait()
+
+
+class ShardedSearch:
+    """Searches split over worker processes for registers of min_rows or more
+
+    Records are cut into contiguous shards, each held by its own worker
+    process (_ShardProcess) with a SearchCache (and trigram index) over it,
+    loaded once and kept warm. A query goes to every shard and the positions come
+    back in shard order, so the merged result is in data order. A ranked
+    contains search gets the best limit of every shard with their ranks;
+    the best limit of those, by rank and then position, are the best of
+    all records. Fuzzy searches and exact or prefix drawing numbers are
+    index lookups, the caller makes them itself.
+
+    Scripts report edits with update/insert/delete like to SearchCache;
+    every shard runs its tasks in order, so a query sees all edits sent
+    before it. Below min_rows (checked on start and reset), while the
+    shards are still loading or after a worker failed, query() returns
+    None and the caller searches itself.
+    """
+
+    def __init__(self, data, fields, min_rows, shards=None):
+        self.data = data
+        self.fields = list(fields)
+        self.min_rows = min_rows
+        self.shards = shards or max(2, min(MAX_SHARDS, os.cpu_count() or 2))
+        self._processes = []
+        self._lengths = []
+        self._loading = []
+        self._failed = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    @property
+    def active(self):
+        return bool(self._processes) and not self._failed
+
+    @property
+    def ready(self):
+        """Every shard has loaded its records"""
+        return self.active and all(future.done() for future in self._loading)
+
+    def reset(self, data=None):
+        """Load all records into the shards again (after data was reloaded)"""
+        if data is not None:
+            self.data = data
+        if not self.min_rows or len(self.data) < self.min_rows:
+            self.close()
+            return
+        with self._lock:
+            if self._failed:
+                self._shutdown()
+            if not self._processes:
+                self._processes = [_ShardProcess() for _ in range(self.shards)]
+            columns = [self.data.column(f) if hasattr(self.data, "column")
+                       else [rec.get(f) for rec in self.data] for f in self.fields]
+            size = -(-len(self.data) // self.shards)
+            self._lengths = []
+            self._loading = []
+            for n, process in enumerate(self._processes):
+                rows = list(zip(*(column[n * size:(n + 1) * size] for column in columns)))
+                self._loading.append(self._submit(process, "load", self.fields, rows))
+                self._lengths.append(len(rows))
+
+    def close(self):
+        with self._lock:
+            self._shutdown()
+
+    def _shutdown(self):
+        for process in self._processes:
+            process.shutdown()
+        self._processes = []
+        self._lengths = []
+        self._loading = []
+        self._failed = []
+
+    def _submit(self, process, name, *args):
+        future = process.submit(name, *args)
+        future.add_done_callback(self._check)
+        return future
+
+    def _check(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            self._failed.append(future.exception())
+
+    def _locate(self, idx, inserting=False):
+        """Shard and position in it of the record at idx"""
+        for shard, length in enumerate(self._lengths):
+            if idx < length or (inserting and idx == length):
+                return shard, idx
+            idx -= length
+        return len(self._lengths) - 1, self._lengths[-1]
+
+    def _record(self, idx):
+        rec = self.data[idx]
+        return {f: rec.get(f) for f in self.fields}
+
+    def update(self, idx):
+        """Record at idx was changed"""
+        if self.active:
+            with self._lock:
+                shard, local = self._locate(idx)
+                self._submit(self._processes[shard], "update", local, self._record(idx))
+
+    def insert(self, idx):
+        """Record was inserted at idx (or appended)"""
+        if self.active:
+            with self._lock:
+                shard, local = self._locate(idx, inserting=True)
+                self._submit(self._processes[shard], "insert", local, self._record(idx))
+                self._lengths[shard] += 1
+
+    def delete(self, idx):
+        """Record at idx was removed"""
+        if self.active:
+            with self._lock:
+                shard, local = self._locate(idx)
+                self._submit(self._processes[shard], "delete", local)
+                self._lengths[shard] -= 1
+
+    def _gather(self, name, *args):
+        """Results of task name on every shard with the shard offsets, None
+        while the shards are still loading (the Tk thread must not wait for
+        that) or after a failure
+        """
+        with self._lock:
+            if not self.ready:
+                return None
+            futures = [process.submit(name, *args) for process in self._processes]
+            offsets = list(accumulate(self._lengths, initial=0))
+        try:
+            return [(offset, future.result()) for offset, future in zip(offsets, futures)]
+        except Exception as e:
+            self._failed.append(e)
+            return None
+
+    def query(self, terms):
+        """Indexes of records matching terms (see SearchCache.query()), None if
+        not ready or for fuzzy and drawing number ordered searches, which
+        the caller searches itself
+        """
+        if not self.active:
+            return None
+        if ranked_query(terms):
+            fields, mode, query = terms[0]
+            return self.ranked(fields[0], query) if mode == "contains" else None
+        shards = self._gather("query", terms)
+        if shards is None:
+            return None
+        return [offset + idx for offset, found in shards for idx in found]
+
+    def ranked(self, field, query, limit=RANK_LIMIT):
+        """SearchCache.ranked() over all shards, None if not ready"""
+        if not self.active:
+            return None
+        shards = self._gather("ranked", field, query, limit)
+        if shards is None:
+            return None
+        ranked = sorted((rank, offset + idx) for offset, (found, _, _) in shards
+                        for rank, idx in found)
+        results = RankedResults(idx for _, idx in ranked[:limit])
+        results.field, results.query = field, normalize(query)
+        results.more = len(ranked) > limit or any(more for _, (_, more, _) in shards)
+        if all(candidates is not None for _, (_, _, candidates) in shards):
+            candidates = [offset + idx for offset, (_, _, found) in shards for idx in found]
+            # As many as one process keeps
+            if len(candidates) <= RANK_INDEX_MAX:
+                results.candidates = candidates
+        return results
+
+    def next_page(self, results, page=RANK_LIMIT):
+        """SearchCache.next_page() over all shards, None if not ready"""
+        return self.ranked(results.field, results.query, limit=len(results) + page)
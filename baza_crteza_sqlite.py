@@ -0,0 +1,111 @@
+import sqlite3
+from contextlib import closing
+
+TABLE = "crtezi"
+
+# Hidden key that carries the SQLite row id inside each record dict
+ROWID_KEY = "_rowid"
+
+# Columns that are indexed for lookups
+KEY_FIELDS = ["IDENTBROJ", "CRTEZBROJ"]
+
+
+def _connect(filename):
+    """Open connection to SQLite database"""
+    return closing(sqlite3.connect(filename, timeout=10))
+
+def _column_type(field):
+    """IDENTBROJ is stored as integer, other columns keep the type they came with"""
+    return "INTEGER" if field == "IDENTBROJ" else ""
+
+def _db_value(value):
+    """Convert value to a type SQLite can store"""
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return str(value)
+
+def _error_message(filename, e):
+    """Translate SQLite exception to user message"""
+    if isinstance(e, sqlite3.OperationalError) and "locked" in str(e):
+        return (
+            f"Ne mogu da sačuvam '{filename}'!\n\n"
+            f"Baza je trenutno zaključana od strane drugog korisnika.\n"
+            f"Molim vas pokušajte ponovo za nekoliko trenutaka."
+        )
+    return f"Greška: {str(e)}"
+
+def create_table(conn, fields):
+    """Create records table and key indexes if they don't exist"""
+    columns = ", ".join(f'"{f}" {_column_type(f)}'.rstrip() for f in fields)
+    conn.execute(f'CREATE TABLE IF NOT EXISTS {TABLE} (id INTEGER PRIMARY KEY, {columns})')
+    for f in KEY_FIELDS:
+        if f in fields:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{TABLE}_{f} ON {TABLE} ("{f}")')
+
+def load_sqlite_data(filename, fields):
+    """Load all records from SQLite database in insertion order"""
+    try:
+        with _connect(filename) as conn:
+            with conn:
+                create_table(conn, fields)
+            columns = ", ".join(f'"{f}"' for f in fields)
+            data = []
+            for row in conn.execute(f"SELECT id, {columns} FROM {TABLE} ORDER BY id"):
+                record = dict(zip(fields, row[1:]))
+                record[ROWID_KEY] = row[0]
+                data.append(record)
+        return data, None
+    except Exception as e:
+        return [], f"Greška pri učitavanju {filename}: {str(e)}"
+
+def replace_sqlite_data(filename, data, fields):
+    """Replace whole table content with given records (used for Excel import)"""
+    columns = ", ".join(f'"{f}"' for f in fields)
+    placeholders = ", ".join("?" for _ in fields)
+    try:
+        with _connect(filename) as conn:
+            with conn:
+                create_table(conn, fields)
+                conn.execute(f"DELETE FROM {TABLE}")
+                for record in data:
+                    cursor = conn.execute(
+                        f"INSERT INTO {TABLE} ({columns}) VALUES ({placeholders})",
+                        [_db_value(record.get(f)) for f in fields]
+                    )
+                    record[ROWID_KEY] = cursor.lastrowid
+        return True, None
+    except Exception as e:
+        return False, _error_message(filename, e)
+
+def save_sqlite_record(filename, record, fields):
+    """Insert or update a single record in one transaction"""
+    columns = ", ".join(f'"{f}"' for f in fields)
+    placeholders = ", ".join("?" for _ in fields)
+    updates = ", ".join(f'"{f}" = excluded."{f}"' for f in fields)
+    values = [_db_value(record.get(f)) for f in fields]
+    try:
+        with _connect(filename) as conn:
+            with conn:
+                cursor = conn.execute(
+                    f"INSERT INTO {TABLE} (id, {columns}) VALUES (?, {placeholders}) "
+                    f"ON CONFLICT(id) DO UPDATE SET {updates}",
+                    [record.get(ROWID_KEY)] + values
+                )
+                if record.get(ROWID_KEY) is None:
+                    record[ROWID_KEY] = cursor.lastrowid
+        return True, None
+    except Exception as e:
+        return False, _error_message(filename, e)
+
+def delete_sqlite_record(filename, record):
+    """Delete a single record by its row id"""
+    rowid = record.get(ROWID_KEY)
+    if rowid is None:
+        return True, None
+    try:
+        with _connect(filename) as conn:
+            with conn:
+                conn.execute(f"DELETE FROM {TABLE} WHERE id = ?", (rowid,))
+        return True, None
+    except Exception as e:
+        return False, _error_message(filename, e)
@@ -0,0 +1,334 @@
+import sys
+from array import array
+from collections import Counter
+
+# Columns with few distinct values, stored as codes into a shared symbol table
+INTERNED_FIELDS = ("FORMAT", "ARHIVA", "KATALOG")
+
+# Columns stored as 64-bit integers while all their values are integers
+INTEGER_FIELDS = ("IDENTBROJ",)
+
+_NONE = -2 ** 63  # Marks None in integer columns
+
+
+class _ListColumn:
+    """Plain list of values"""
+
+    def __init__(self, values=()):
+        self.values = list(values)
+
+    def get(self, idx):
+        return self.values[idx]
+
+    def set(self, idx, value):
+        self.values[idx] = value
+
+    def insert(self, idx, value):
+        self.values.insert(idx, value)
+
+    def delete(self, idx):
+        del self.values[idx]
+
+    def splice(self, start, stop, values):
+        self.values[start:stop] = values
+
+    def scan(self, predicate):
+        return [i for i, value in enumerate(self.values) if predicate(value)]
+
+    def to_list(self):
+        return list(self.values)
+
+
+class _IntegerColumn:
+    """Integers in an array, degrades to a list on the first non-integer value"""
+
+    def __init__(self):
+        self.values = array("q")
+
+    @staticmethod
+    def accepts(value):
+        return value is None or (type(value) is int and value != _NONE and -2 ** 63 < value < 2 ** 63)
+
+    def get(self, idx):
+        value = self.values[idx]
+        return None if value == _NONE else value
+
+    def set(self, idx, value):
+        self.values[idx] = _NONE if value is None else value
+
+    def insert(self, idx, value):
+        self.values.insert(idx, _NONE if value is None else value)
+
+    def delete(self, idx):
+        del self.values[idx]
+
+    def splice(self, start, stop, values):
+        self.values[start:stop] = array("q", (_NONE if value is None else value for value in values))
+
+    def scan(self, predicate):
+        return [i for i, value in enumerate(self.to_list()) if predicate(value)]
+
+    def to_list(self):
+        return [None if value == _NONE else value for value in self.values]
+
+
+class _InternedColumn:
+    """Codes into a table of distinct values (code 0 is None)"""
+
+    def __init__(self):
+        self.codes = array("I")
+        self.symbols = [None]
+        self.lookup = {None: 0}
+
+    def _code(self, value):
+        code = self.lookup.get(value)
+        if code is None:
+            if isinstance(value, str):
+                value = sys.intern(value)
+            code = self.lookup[value] = len(self.symbols)
+            self.symbols.append(value)
+        return code
+
+    def get(self, idx):
+        return self.symbols[self.codes[idx]]
+
+    def set(self, idx, value):
+        self.codes[idx] = self._code(value)
+
+    def insert(self, idx, value):
+        self.codes.insert(idx, self._code(value))
+
+    def delete(self, idx):
+        del self.codes[idx]
+
+    def splice(self, start, stop, values):
+        self.codes[start:stop] = array("I", map(self._code, values))
+
+    def scan(self, predicate):
+        # Test every distinct value once, then match codes
+        matching = {code for code, value in enumerate(self.symbols) if predicate(value)}
+        if not matching:
+            return []
+        return [i for i, code in enumerate(self.codes) if code in matching]
+
+    def to_list(self):
+        symbols = self.symbols
+        return [symbols[code] for code in self.codes]
+
+
+class RecordView:
+    """Dict-like access to one row of a RecordStore, writes go to the store
+
+    A view addresses its row by position, so it must not be kept across
+    inserts or deletes of earlier rows.
+    """
+
+    __slots__ = ("_store", "_idx")
+
+    def __init__(self, store, idx):
+        self._store = store
+        self._idx = idx
+
+    def get(self, field, default=None):
+        column = self._store._columns.get(field)
+        if column is None:
+            return default
+        return column.get(self._idx)
+
+    def __getitem__(self, field):
+        if field not in self._store._columns:
+            raise KeyError(field)
+        return self._store._columns[field].get(self._idx)
+
+    def __setitem__(self, field, value):
+        self._store._set(self._idx, field, value)
+
+    def update(self, values):
+        for field, value in values.items():
+            self._store._set(self._idx, field, value)
+
+    def keys(self):
+        return list(self._store._columns)
+
+    def items(self):
+        return [(field, column.get(self._idx)) for field, column in self._store._columns.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self._store._columns)
+
+    def __contains__(self, field):
+        return field in self._store._columns
+
+    def copy(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        return dict(self.items()) == dict(other.items()) if hasattr(other, "items") else NotImplemented
+
+    def __repr__(self):
+        return repr(self.copy())
+
+
+class RecordStore:
+    """Columnar replacement for a list of record dicts
+
+    Supports the list operations the scripts use (len, indexing, iteration,
+    append, insert, del) and returns RecordView objects for rows.
+    """
+
+    def __init__(self, fields, records=()):
+        self._columns = {}
+        self._length = 0
+        for field in fields:
+            self._add_column(field)
+        for record in records:
+            self.append(record)
+
+    def _add_column(self, field):
+        if field in INTERNED_FIELDS:
+            column = _InternedColumn()
+        elif field in INTEGER_FIELDS:
+            column = _IntegerColumn()
+        else:
+            column = _ListColumn()
+        for _ in range(self._length):
+            column.insert(self._length, None)
+        self._columns[field] = column
+        return column
+
+    def _column_for(self, field, value):
+        column = self._columns.get(field)
+        if column is None:
+            column = self._columns[field] = _ListColumn([None] * self._length)
+        elif isinstance(column, _IntegerColumn) and not column.accepts(value):
+            column = self._columns[field] = _ListColumn(column.to_list())
+        return column
+
+    def _set(self, idx, field, value):
+        self._column_for(field, value).set(idx, value)
+
+    def __len__(self):
+        return self._length
+
+    def _index(self, idx):
+        if idx < 0:
+            idx += self._length
+        if not 0 <= idx < self._length:
+            raise IndexError("record index out of range")
+        return idx
+
+    def __getitem__(self, idx):
+        return RecordView(self, self._index(idx))
+
+    def __iter__(self):
+        for idx in range(self._length):
+            yield RecordView(self, idx)
+
+    def insert(self, idx, record):
+        idx = max(0, min(idx if idx >= 0 else idx + self._length, self._length))
+        for field, value in record.items():
+            self._column_for(field, value)
+        for field, column in self._columns.items():
+            column.insert(idx, record.get(field))
+        self._length += 1
+
+    def append(self, record):
+        self.insert(self._length, record)
+
+    def splice(self, start, stop, records):
+        """Replace rows start..stop-1 with records, one slice assignment per column"""
+        for record in records:
+            for field, value in record.items():
+                self._column_for(field, value)
+        for field, column in self._columns.items():
+            column.splice(start, stop, [record.get(field) for record in records])
+        self._length += len(records) - (stop - start)
+
+    def __delitem__(self, idx):
+        idx = self._index(idx)
+        for column in self._columns.values():
+            column.delete(idx)
+        self._length -= 1
+
+    def column(self, field):
+        """All values of a field as a list"""
+        column = self._columns.get(field)
+        return column.to_list() if column else [None] * self._length
+
+    def scan(self, field, predicate):
+        """Indexes of rows whose field value satisfies predicate"""
+        column = self._columns.get(field)
+        if column is None:
+            return list(range(self._length)) if predicate(None) else []
+        return column.scan(predicate)
+
+    def to_records(self):
+        """Materialize all rows as plain dicts"""
+        columns = {field: column.to_list() for field, column in self._columns.items()}
+        return [{field: values[idx] for field, values in columns.items()}
+                for idx in range(self._length)]
+
+
+def diff_records(store, records, key, fields, max_changed=0.5):
+    """Row-level diff between store and freshly loaded records, matched by key field
+
+    Returns (ops, counts): (op, index, payload) operations that turn store
+    into records when applied in order with apply_changes(), and the number
+    of records "updated", "added" and "deleted" (by key), or None if so much
+    changed that rebuilding the store is cheaper.
+
+    Rows of the common prefix and suffix (by key) are updated in place, the
+    block between them is replaced at once: ("splice", start, (old count,
+    new records)). Its rows are counted as added or deleted only if their
+    key is not on the other side.
+    """
+    old_rows = list(zip(*[store.column(f) for f in fields])) if len(store) else []
+    new_rows = [tuple(rec.get(f) for f in fields) for rec in records]
+    key_pos = fields.index(key)
+
+    # Common prefix and suffix by key - rows there are updated in place
+    start = 0
+    limit = min(len(old_rows), len(new_rows))
+    while start < limit and old_rows[start][key_pos] == new_rows[start][key_pos]:
+        start += 1
+    old_end, new_end = len(old_rows), len(new_rows)
+    while (old_end > start and new_end > start
+           and old_rows[old_end - 1][key_pos] == new_rows[new_end - 1][key_pos]):
+        old_end -= 1
+        new_end -= 1
+
+    if max(old_end - start, new_end - start) > max_changed * max(len(new_rows), 1):
+        return None
+
+    ops = []
+    counts = {"updated": 0, "added": 0, "deleted": 0}
+    if old_end > start or new_end > start:
+        ops.append(("splice", start, (old_end - start, records[start:new_end])))
+        old_block, new_block = old_rows[start:old_end], new_rows[start:new_end]
+        old_keys = Counter(row[key_pos] for row in old_block)
+        new_keys = Counter(row[key_pos] for row in new_block)
+        counts["added"] = sum((new_keys - old_keys).values())
+        counts["deleted"] = sum((old_keys - new_keys).values())
+        # Rows not found unchanged on the old side, less the added ones, were edited
+        new_or_changed = sum((Counter(new_block) - Counter(old_block)).values())
+        counts["updated"] = max(0, new_or_changed - counts["added"])
+    # Updates in new positions
+    shift = new_end - old_end
+    for idx in list(range(start)) + list(range(old_end, len(old_rows))):
+        new_idx = idx if idx < start else idx + shift
+        if old_rows[idx] != new_rows[new_idx]:
+            ops.append(("update", new_idx, records[new_idx]))
+            counts["updated"] += 1
+    return ops, counts
+
+def apply_changes(store, ops):
+    """Apply operations from diff_records() to store"""
+    for op, idx, payload in ops:
+        if op == "splice":
+            count, records = payload
+            store.splice(idx, idx + count, records)
+        else:
+            store[idx].update(payload)
@@ -0,0 +1,256 @@
+import tkinter as tk
+from tkinter import ttk
+import tkinter.font as tkFont
+
+# Column widths in pixels (other fields get DEFAULT_WIDTH)
+COLUMN_WIDTHS = {"IDENTBROJ": 90, "CRTEZBROJ": 170, "NAZIVDELA": 260, "TEHNPODACI": 220,
+                 "FORMAT": 70, "ARHIVA": 70, "KOMENTAR": 220}
+DEFAULT_WIDTH = 130
+
+WHEEL_ROWS = 3  # Rows per mouse wheel step
+
+# Columns of the search results panel
+RESULT_HEADINGS = {"CRTEZBROJ": "Broj crteža", "NAZIVDELA": "Naziv dela"}
+RESULT_WIDTHS = {"CRTEZBROJ": 150, "NAZIVDELA": 230}
+
+
+class VirtualTable:
+    """Treeview over a list of rows that only holds the rows in view
+
+    Rows are records of data (rows is None) or records at the indexes in
+    rows. The Treeview has one item per row that fits; scrolling moves a
+    window over the rows and fills those items with the values of the rows
+    now in view, so 200k rows cost the same as 200. The scrollbar is driven
+    by position and count instead of by the Treeview.
+
+    Selecting a row (mouse or keys) calls on_select(position); show(position)
+    selects one without the call. on_end() is called when scrolling reaches
+    the last row.
+    """
+
+    def __init__(self, data, fields, on_select, rows=None, headings=None, widths=None,
+                 on_end=None):
+        self.data = data
+        self.fields = list(fields)
+        self.rows = rows
+        self.headings = headings or {}
+        self.widths = widths or COLUMN_WIDTHS
+        self.on_select = on_select
+        self.on_end = on_end
+        self.tree = None
+        self.top = 0          # Position of the first row in view
+        self.selected = None  # Position of the selected row
+        self._items = []
+
+    def __len__(self):
+        return len(self.data) if self.rows is None else len(self.rows)
+
+    def _record(self, pos):
+        return self.data[pos if self.rows is None else self.rows[pos]]
+
+    def _build(self, parent):
+        linespace = tkFont.nametofont("TkDefaultFont").metrics("linespace")
+        self._rowheight = linespace + 6
+        ttk.Style().configure("Table.Treeview", rowheight=self._rowheight)
+
+        frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(frame, columns=self.fields, show="headings",
+                                 selectmode="browse", style="Table.Treeview")
+        self.scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self._scrollbar)
+        xscrollbar = ttk.Scrollbar(frame, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=xscrollbar.set)
+        for f in self.fields:
+            self.tree.heading(f, text=self.headings.get(f, f))
+            self.tree.column(f, width=self.widths.get(f, DEFAULT_WIDTH), stretch=False)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        xscrollbar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.tree.bind("<Configure>", self._resize)
+        self.tree.bind("<<TreeviewSelect>>", self._clicked)
+        self.tree.bind("<MouseWheel>", lambda e: self._wheel(-1 if e.delta > 0 else 1))
+        self.tree.bind("<Button-4>", lambda e: self._wheel(-1))
+        self.tree.bind("<Button-5>", lambda e: self._wheel(1))
+        for key, step in (("<Up>", -1), ("<Down>", 1), ("<Prior>", "-page"),
+                          ("<Next>", "page"), ("<Home>", "first"), ("<End>", "last")):
+            self.tree.bind(key, lambda e, step=step: self._key(step))
+        self._items = []
+        return frame
+
+    def reset(self, data):
+        """Show a new data list"""
+        self.data = data
+        self.top = 0
+        self.selected = None
+        self.refresh()
+
+    def refresh(self):
+        """Fill the visible rows again (after rows were changed, added or removed)"""
+        if self.tree is None:
+            return
+        total = len(self)
+        self.top = max(0, min(self.top, total - len(self._items)))
+        for n, iid in enumerate(self._items):
+            pos = self.top + n
+            if pos < total:
+                rec = self._record(pos)
+                values = ["" if rec.get(f) is None else str(rec.get(f)) for f in self.fields]
+            else:
+                values = [""] * len(self.fields)
+            self.tree.item(iid, values=values)
+
+        row = None if self.selected is None else self.selected - self.top
+        if row is not None and 0 <= row < len(self._items):
+            self.tree.selection_set(self._items[row])
+        else:
+            self.tree.selection_set(())
+
+        if total > len(self._items):
+            self.scrollbar.set(self.top / total, (self.top + len(self._items)) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def show(self, pos):
+        """Select row pos and scroll it into view, without calling on_select"""
+        self.selected = pos
+        if self.tree is None:
+            return
+        if pos is not None:
+            if pos < self.top:
+                self.top = pos
+            elif pos >= self.top + len(self._items):
+                self.top = pos - len(self._items) + 1
+        self.refresh()
+
+    def scroll(self, rows):
+        self.top += rows
+        self.refresh()
+        self._scrolled()
+
+    def _scrolled(self):
+        if self.on_end is not None and self._items and self.top + len(self._items) >= len(self):
+            self.on_end()
+
+    def _resize(self, event):
+        # The first row starts below the headings
+        bbox = self.tree.bbox(self._items[0]) if self._items else ""
+        heading = bbox[1] if bbox else self._rowheight + 4
+        rows = max(1, (event.height - heading) // self._rowheight)
+        while len(self._items) < rows:
+            self._items.append(self.tree.insert("", tk.END, iid=str(len(self._items))))
+        while len(self._items) > rows:
+            self.tree.delete(self._items.pop())
+        self.refresh()
+
+    def _scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.top = int(float(amount) * len(self))
+            self.refresh()
+            self._scrolled()
+        elif unit == "pages":
+            self.scroll(int(amount) * max(1, len(self._items) - 1))
+        else:
+            self.scroll(int(amount))
+
+    def _wheel(self, direction):
+        self.scroll(direction * WHEEL_ROWS)
+        return "break"
+
+    def _clicked(self, event):
+        selection = self.tree.selection()
+        if not selection:
+            return
+        pos = self.top + int(selection[0])
+        if pos < len(self) and pos != self.selected:
+            self.selected = pos
+            self.on_select(pos)
+
+    def _key(self, step):
+        if not len(self):
+            return "break"
+        page = max(1, len(self._items) - 1)
+        current = self.top if self.selected is None else self.selected
+        pos = {"first": 0, "last": len(self) - 1,
+               "page": current + page, "-page": current - page}.get(step)
+        if pos is None:
+            pos = current + step
+        pos = max(0, min(pos, len(self) - 1))
+        self.show(pos)
+        self._scrolled()
+        self.on_select(pos)
+        return "break"
+
+
+class RecordTable(VirtualTable):
+    """Table of all records in its own window
+
+    Positions are record indexes. Scripts pass load_record as on_select
+    and call show(idx) from load_record, so the table follows the detail
+    form. After edits call refresh(), after data was replaced reset(data).
+    """
+
+    def __init__(self, root, data, fields, on_select, title="Tabela"):
+        super().__init__(data, fields, on_select)
+        self.root = root
+        self.title = title
+        self.window = None
+
+    def open(self, idx=None):
+        """Show the window (or raise it), scrolled to record idx"""
+        if idx is not None:
+            self.selected = idx
+        if self.window is None:
+            self.window = tk.Toplevel(self.root)
+            self.window.title(self.title)
+            self.window.geometry("1200x600")
+            self.window.protocol("WM_DELETE_WINDOW", self.close)
+            self._build(self.window).pack(fill=tk.BOTH, expand=True)
+        else:
+            self.window.deiconify()
+            self.window.lift()
+        self.show(self.selected)
+
+    def close(self):
+        self.window.destroy()
+        self.window = None
+        self.tree = None
+        self._items = []
+
+
+class ResultsPanel(VirtualTable):
+    """Side panel with the drawing number and name of each search result
+
+    Positions are result numbers (search_index). The panel is packed with
+    pack_options while there are results and hidden otherwise. For ranked
+    results that stopped early (more is set) on_end() asks the script for
+    the next page, which it passes to more_results().
+    """
+
+    def __init__(self, parent, data, on_select, on_end=None, **pack_options):
+        super().__init__(data, list(RESULT_HEADINGS), on_select, rows=[], headings=RESULT_HEADINGS,
+                         widths=RESULT_WIDTHS, on_end=on_end)
+        self.pack_options = pack_options
+        self.frame = self._build(parent)
+
+    def set_results(self, results, selected=None):
+        """Show a new list of results (record indexes), hide the panel if empty"""
+        self.rows = results or []
+        self.top = 0
+        if self.rows:
+            self.frame.pack(**self.pack_options)
+        else:
+            self.frame.pack_forget()
+        self.show(selected)
+
+    def more_results(self, results):
+        """Show results with more rows at the end, keeping the position"""
+        self.rows = results
+        self.refresh()
+
+    def reset(self, data):
+        self.data = data
+        self.set_results([])
+
+    def _scrolled(self):
+        if getattr(self.rows, "more", False):
+            super()._scrolled()
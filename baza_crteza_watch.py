@@ -0,0 +1,71 @@
+import os
+import threading
+import time
+import zipfile
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+        return (st.st_size, st.st_mtime_ns)
+    except OSError:
+        return None
+
+def _write_finished(path):
+    """A workbook is complete once its zip central directory can be read"""
+    try:
+        with zipfile.ZipFile(path) as zf:
+            zf.infolist()
+        return True
+    except (OSError, zipfile.BadZipFile):
+        return False
+
+
+class FileWatcher:
+    """Poll a file with os.stat on a background thread and report finished changes
+
+    A change is reported once the file has kept the same size and mtime for
+    settle seconds and the writer has finished, so a burst of writes (or a
+    slow save over the network) results in a single on_change() call.
+    on_change() runs on the watcher thread.
+    """
+
+    def __init__(self, path, interval, on_change, settle=None, is_complete=_write_finished):
+        self.path = path
+        self.interval = interval
+        self.settle = max(interval, 1.0) if settle is None else settle
+        self.on_change = on_change
+        self.is_complete = is_complete
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        last = _stat(self.path)
+        pending = None
+        changed_at = 0.0
+        while not self._stop.wait(self.interval):
+            current = _stat(self.path)
+            if current != last:
+                # Still being written - restart the quiet period
+                last = current
+                pending = current
+                changed_at = time.monotonic()
+                continue
+            if pending is None or current is None:
+                continue
+            if time.monotonic() - changed_at < self.settle:
+                continue
+            if not self.is_complete(self.path):
+                changed_at = time.monotonic()
+                continue
+            pending = None
+            try:
+                self.on_change()
+            except Exception as e:
+                print(f"Error reloading {self.path}: {e}")
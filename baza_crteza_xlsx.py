@@ -0,0 +1,194 @@
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from xml.parsers import expat
+
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+CHUNK_SIZE = 256 * 1024
+
+
+def _local(tag):
+    """Tag name without namespace (works for both transitional and strict files)"""
+    return tag.rsplit("}", 1)[-1]
+
+def _column_index(letters):
+    """Convert column letters to zero based index (A -> 0, AA -> 26)"""
+    idx = 0
+    for ch in letters:
+        idx = idx * 26 + ord(ch) - 64
+    return idx - 1
+
+def _number(text):
+    """Cast numeric cell text the same way openpyxl does"""
+    if "." in text or "E" in text or "e" in text:
+        return float(text)
+    return int(text)
+
+def _sheet_path(zf):
+    """Path of the active worksheet inside the archive"""
+    workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+    active = 0
+    sheets = []
+    for elem in workbook.iter():
+        name = _local(elem.tag)
+        if name == "workbookView":
+            active = int(elem.get("activeTab", 0))
+        elif name == "sheet":
+            sheets.append(elem.get(REL_NS + "id"))
+
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id"): rel.get("Target") for rel in rels.iter(PKG_REL_NS + "Relationship")}
+    target = targets[sheets[min(active, len(sheets) - 1)]]
+    if target.startswith("/"):
+        return target[1:]
+    return posixpath.normpath(posixpath.join("xl", target))
+
+def _feed(parser, source, ready):
+    """Push the archive member through the parser in chunks, yield parsed items as they complete"""
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        parser.Parse(chunk, not chunk)
+        if ready:
+            yield from ready
+            ready.clear()
+        if not chunk:
+            break
+
+def _shared_strings(zf):
+    """Stream sharedStrings.xml into a list"""
+    try:
+        source = zf.open("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+
+    strings = []
+    parts = []
+    state = {"text": False, "phonetic": False}
+
+    def start(name, attrs):
+        name = name.rpartition(":")[2]
+        if name == "t":
+            state["text"] = not state["phonetic"]
+        elif name == "rPh":
+            state["phonetic"] = True
+
+    def end(name):
+        name = name.rpartition(":")[2]
+        if name == "t":
+            state["text"] = False
+        elif name == "rPh":
+            state["phonetic"] = False
+        elif name == "si":
+            strings.append("".join(parts))
+            parts.clear()
+
+    def data(text):
+        if state["text"]:
+            parts.append(text)
+
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = data
+    with source:
+        for _ in _feed(parser, source, []):
+            pass
+    return strings
+
+def _sheet_rows(source, strings):
+    """Stream sheet XML, yield (row number, values) for every <row>"""
+    ready = []
+    values = []
+    parts = []
+    columns = {}
+    # Element names with the namespace prefix used by the file (usually none)
+    names = {}
+    state = {"col": 0, "type": "n", "row": 0, "text": False, "phonetic": False}
+
+    def start(name, attrs):
+        if not names:
+            prefix = name.rpartition(":")[0]
+            prefix = prefix + ":" if prefix else ""
+            names.update({n: prefix + n for n in ("c", "v", "t", "rPh", "row")})
+        if name == names["c"]:
+            ref = attrs.get("r")
+            if ref:
+                letters = ref.rstrip("0123456789")
+                col = columns.get(letters)
+                if col is None:
+                    col = columns[letters] = _column_index(letters)
+                state["col"] = col
+            else:
+                state["col"] = len(values)
+            state["type"] = attrs.get("t", "n")
+            parts.clear()
+        elif name == names["v"] or name == names["t"]:
+            state["text"] = not state["phonetic"]
+        elif name == names["row"]:
+            state["row"] = int(attrs["r"]) if "r" in attrs else state["row"] + 1
+            values.clear()
+        elif name == names["rPh"]:
+            state["phonetic"] = True
+
+    def end(name):
+        if name == names["c"]:
+            col = state["col"]
+            while len(values) < col:
+                values.append(None)
+            values.append(_cell_value(state["type"], "".join(parts) if parts else None, strings))
+        elif name == names["v"] or name == names["t"]:
+            state["text"] = False
+        elif name == names["row"]:
+            ready.append((state["row"], list(values)))
+        elif name == names["rPh"]:
+            state["phonetic"] = False
+
+    def data(text):
+        if state["text"]:
+            parts.append(text)
+
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = data
+    yield from _feed(parser, source, ready)
+
+def _cell_value(cell_type, text, strings):
+    if text is None:
+        return None
+    if cell_type == "s":
+        return strings[int(text)]
+    if cell_type == "n":
+        return _number(text)
+    if cell_type == "b":
+        return text == "1"
+    # "inlineStr", "str" (formula result), "e" (error) and "d" (ISO date) stay text
+    return text
+
+def iter_xlsx_rows(filename):
+    """Yield value lists for every row of the active sheet, starting with row 1
+
+    Missing rows are yielded as empty lists so that positions match the sheet.
+    """
+    with zipfile.ZipFile(filename) as zf:
+        strings = _shared_strings(zf)
+        with zf.open(_sheet_path(zf)) as source:
+            expected_row = 1
+            for row_number, values in _sheet_rows(source, strings):
+                while expected_row < row_number:
+                    yield []
+                    expected_row += 1
+                yield values
+                expected_row = row_number + 1
+
+def read_xlsx_rows(filename, fields):
+    """Yield value lists in fields order for each data row (columns found by header row)"""
+    rows = iter_xlsx_rows(filename)
+    headers = next(rows, [])
+    columns = [headers.index(f) if f in headers else None for f in fields]
+    for row in rows:
+        yield [row[c] if c is not None and c < len(row) else None for c in columns]
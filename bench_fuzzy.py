@@ -0,0 +1,74 @@
+"""Benchmark: fuzzy search with the deletion index vs comparing the query with every value
+
+Usage: python bench_fuzzy.py [rows ...]
+"""
+import random
+import statistics
+import sys
+import time
+
+from baza_crteza_search import SearchCache, edit_distance, normalize
+from bench_xlsx_reader import FIELDS, make_record
+
+QUERIES = 30
+
+
+def typo(value, edits, rng):
+    """Apply random replace/insert/delete edits to value"""
+    chars = list(value)
+    for _ in range(edits):
+        pos = rng.randrange(len(chars))
+        kind = rng.choice(("replace", "insert", "delete"))
+        if kind == "replace":
+            chars[pos] = rng.choice("0123456789")
+        elif kind == "insert":
+            chars.insert(pos, rng.choice("0123456789"))
+        elif len(chars) > 1:
+            del chars[pos]
+    return "".join(chars)
+
+def measure(cache, field, queries):
+    times = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(cache.search(field, query, "fuzzy"))
+        times.append(time.perf_counter() - start)
+    return results, times
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 300_000]
+    rng = random.Random(1)
+    for rows in sizes:
+        data = [dict(zip(FIELDS, make_record(i))) for i in range(1, rows + 1)]
+        print(f"\n{rows} redova")
+
+        indexed = SearchCache(data)
+        start = time.perf_counter()
+        indexed.start_index(FIELDS)
+        while not indexed.index_ready():
+            time.sleep(0.01)
+        print(f"  indeksi (trigram + brisanja, u pozadini): {time.perf_counter() - start:8.2f} s")
+        scanned = SearchCache(data)
+
+        for field in ("CRTEZBROJ", "KATALBROJ"):
+            for edits in (1, 2):
+                queries = [typo(normalize(data[rng.randrange(rows)][field]), edits, rng)
+                           for _ in range(QUERIES)]
+                found, t_tree = measure(indexed, field, queries)
+                expected, t_scan = measure(scanned, field, queries)
+                # Ties at the same distance may pick different records, compare distances
+                values = indexed.values(field)
+                same = sum(
+                    [edit_distance(normalize(q), values[i]) for i in a] ==
+                    [edit_distance(normalize(q), values[i]) for i in b]
+                    for q, a, b in zip(queries, found, expected)
+                )
+                print(f"  {field:10} {edits} greške  "
+                      f"indeks prosek {statistics.mean(t_tree) * 1000:7.1f} ms  "
+                      f"max {max(t_tree) * 1000:7.1f} ms  |  "
+                      f"poređenje sa svima {statistics.mean(t_scan) * 1000:7.1f} ms  "
+                      f"isti rezultat: {same}/{QUERIES}")
+
+if __name__ == "__main__":
+    main()
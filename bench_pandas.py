@@ -0,0 +1,71 @@
+"""Benchmark: search with per-record normalize() vs vectorized FrameSearch over a DataFrame
+
+Plain searches (one contains term) are ranked; the loop ranks all its
+matches and the first RANK_LIMIT are compared.
+
+Usage: python bench_pandas.py [rows ...]
+"""
+import sys
+
+import pandas as pd
+
+from baza_crteza_frame import FrameSearch
+from baza_crteza_search import RANK_LIMIT, normalize, parse_query, word_starts
+from bench_search import QUERIES, KEY_QUERIES, key_loop_search, loop_search, timed
+from bench_xlsx_reader import FIELDS, make_record
+
+
+def loop_ranked(data, field, query):
+    """Matches of loop_search() ranked like SearchCache.ranked()"""
+    val = normalize(query)
+
+    def rank(idx):
+        value = normalize(data[idx].get(field))
+        if value == val:
+            return 0
+        if value.startswith(val):
+            return 1
+        starts = word_starts(data[idx].get(field))
+        return 2 if any(value.startswith(val, pos) for pos in starts) else 3
+
+    return sorted(loop_search(data, field, query), key=rank)[:RANK_LIMIT]
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for rows in sizes:
+        data = [dict(zip(FIELDS, make_record(i))) for i in range(1, rows + 1)]
+        df = pd.DataFrame(data, columns=FIELDS)
+        df = df.where(pd.notna(df), None)
+        frame = FrameSearch(df, FIELDS)
+        print(f"\n{rows} redova")
+
+        fields = {f for f, _ in QUERIES} | {f for f, _, _ in KEY_QUERIES}
+        _, t_build = timed(lambda: [frame.column(field) for field in fields])
+        print(f"  normalizovane kolone ({len(fields)}): {t_build:8.3f} s")
+
+        for field, query in QUERIES:
+            terms = [((field,), "contains", normalize(query))]
+            expected, t_loop = timed(lambda: loop_ranked(data, field, query))
+            found, t_frame = timed(lambda: frame.query(terms))
+            print(f"  {field:10} {query!r:14} pogodaka {len(found):7}  "
+                  f"petlja {t_loop * 1000:8.1f} ms  pandas {t_frame * 1000:7.2f} ms  "
+                  f"ubrzanje {t_loop / max(t_frame, 1e-9):5.0f}x  "
+                  f"isti rezultat: {'da' if found == expected else 'NE'}")
+
+        for field, query, mode in KEY_QUERIES:
+            terms = [((field,), mode, normalize(query))]
+            expected, t_loop = timed(lambda: key_loop_search(data, field, query, mode))
+            found, t_frame = timed(lambda: frame.query(terms))
+            print(f"  {field:10} {mode:6} {query!r:14} pogodaka {len(found):5}  "
+                  f"petlja {t_loop * 1000:8.1f} ms  pandas {t_frame * 1000:7.2f} ms  "
+                  f"isti rezultat: {'da' if sorted(found) == expected else 'NE'}")
+
+        terms, _ = parse_query("FORMAT=A3 NAZIVDELA~vijak OBJEKAT*~kran", FIELDS, "NAZIVDELA")
+        for fields, _, _ in terms:
+            for field in fields:
+                frame.column(field)
+        found, t_frame = timed(lambda: frame.query(terms))
+        print(f"  upit sa tri polja   pogodaka {len(found):7}  pandas {t_frame * 1000:7.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark: search with per-record normalize() vs SearchCache (joined text, trigram and key indexes)
+
+Usage: python bench_search.py [rows ...]
+"""
+import sys
+import time
+
+from baza_crteza_search import SearchCache, normalize
+from bench_xlsx_reader import FIELDS, make_record
+
+QUERIES = [
+    ("CRTEZBROJ", "12-0001"),
+    ("CRTEZBROJ", "/3"),
+    ("NAZIVDELA", "vijak m12"),
+    ("KATALBROJ", "k-4999"),
+    ("MAGSIFRA", "nepostoji"),
+]
+
+KEY_QUERIES = [
+    ("CRTEZBROJ", "15-000112/0", "exact"),
+    ("CRTEZBROJ", "12-0001", "prefix"),
+    ("IDENTBROJ", "4242", "exact"),
+]
+
+
+def key_loop_search(data, field, query, mode):
+    val = normalize(query)
+    if mode == "prefix":
+        return [i for i, rec in enumerate(data) if normalize(rec.get(field)).startswith(val)]
+    return [i for i, rec in enumerate(data) if normalize(rec.get(field)) == val]
+
+def loop_search(data, field, query):
+    """Search the way do_search() did it"""
+    val = normalize(query)
+    return [i for i, rec in enumerate(data) if val in normalize(rec.get(field))]
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [100_000, 300_000]
+    for rows in sizes:
+        data = [dict(zip(FIELDS, make_record(i))) for i in range(1, rows + 1)]
+        cache = SearchCache(data)
+        print(f"\n{rows} redova")
+
+        _, t_build = timed(lambda: [cache.search(field, "x") for field in {f for f, _ in QUERIES}])
+        print(f"  priprema keša (prva pretraga): {t_build:8.3f} s")
+
+        joined = {}
+        for field, query in QUERIES:
+            expected, t_loop = timed(lambda: loop_search(data, field, query))
+            found, t_cache = timed(lambda: cache.search(field, query))
+            joined[field, query] = (expected, t_loop, t_cache)
+            print(f"  {field:10} {query!r:14} pogodaka {len(found):7}  "
+                  f"petlja {t_loop * 1000:8.1f} ms  keš {t_cache * 1000:7.2f} ms  "
+                  f"ubrzanje {t_loop / max(t_cache, 1e-9):6.0f}x  "
+                  f"isti rezultat: {'da' if found == expected else 'NE'}")
+
+        start = time.perf_counter()
+        cache.start_index(FIELDS)
+        while not cache.index_ready():
+            time.sleep(0.01)
+        print(f"  trigram indeks (svih {len(FIELDS)} polja, u pozadini): {time.perf_counter() - start:8.3f} s")
+        for field, query in QUERIES:
+            expected, t_loop, t_cache = joined[field, query]
+            found, t_index = timed(lambda: cache.search(field, query))
+            print(f"  {field:10} {query!r:14} pogodaka {len(found):7}  "
+                  f"keš {t_cache * 1000:7.2f} ms  indeks {t_index * 1000:7.2f} ms  "
+                  f"isti rezultat: {'da' if found == expected else 'NE'}")
+
+        for field, query, mode in KEY_QUERIES:
+            expected, t_loop = timed(lambda: key_loop_search(data, field, query, mode))
+            cache.search(field, query, mode)  # Builds the key index
+            found, t_key = timed(lambda: cache.search(field, query, mode))
+            print(f"  {field:10} {mode:7} {query!r:8} pogodaka {len(found):6}  "
+                  f"petlja {t_loop * 1000:8.1f} ms  ključ {t_key * 1000:7.3f} ms  "
+                  f"isti rezultat: {'da' if sorted(found) == expected else 'NE'}")
+
+        # An edit followed by a search pays for rebuilding the joined text once
+        data[rows // 2]["NAZIVDELA"] = "Vijak specijalni"
+        cache.update(rows // 2)
+        found, t_edit = timed(lambda: cache.search("NAZIVDELA", "specijalni"))
+        print(f"  pretraga posle izmene: {t_edit * 1000:.1f} ms ({len(found)} pogodak)")
+
+if __name__ == "__main__":
+    main()
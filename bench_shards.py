@@ -0,0 +1,58 @@
+"""Benchmark: ranked searches in one process vs ShardedSearch worker processes
+
+Run it on the machine the app runs on before turning PARALLEL_MIN_ROWS on.
+
+Usage: python bench_shards.py [rows [shards]]
+"""
+import sys
+import time
+
+from baza_crteza_search import SearchCache
+from baza_crteza_shards import ShardedSearch
+from baza_crteza_store import RecordStore
+from bench_xlsx_reader import FIELDS, make_record
+
+QUERIES = [
+    ("CRTEZBROJ", "/3"),
+    ("NAZIVDELA", "vijak"),
+    ("NAZIVDELA", "m12"),
+    ("KATALBROJ", "k-4999"),
+    ("MAGSIFRA", "nepostoji"),
+]
+REPEAT = 5
+
+
+def timed(fn):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    shards = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    data = RecordStore(FIELDS, (dict(zip(FIELDS, make_record(i))) for i in range(1, rows + 1)))
+    cache = SearchCache(data)
+    cache.start_index(FIELDS)
+    start = time.perf_counter()
+    sharded = ShardedSearch(data, FIELDS, 1, shards)
+    while not (sharded.ready and cache.index_ready()):
+        if not sharded.active:
+            sys.exit("Procesi za pretragu nisu pokrenuti")
+        time.sleep(0.01)
+    print(f"{rows} redova, {sharded.shards} procesa, učitano za {time.perf_counter() - start:.2f} s")
+
+    for field, query in QUERIES:
+        expected, t_one = timed(lambda: cache.ranked(field, query))
+        found, t_shards = timed(lambda: sharded.ranked(field, query))
+        print(f"  {field:10} {query!r:12} pogodaka {len(found):4}  "
+              f"jedan proces {t_one * 1000:8.1f} ms  procesi {t_shards * 1000:8.1f} ms  "
+              f"ubrzanje {t_one / max(t_shards, 1e-9):5.1f}x  "
+              f"isti rezultat: {'da' if list(found) == list(expected) else 'NE'}")
+    sharded.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Benchmark: streaming xlsx reader vs openpyxl read_only=True
+
+Usage: python bench_xlsx_reader.py [rows ...]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from xml.sax.saxutils import escape
+
+from baza_crteza_xlsx import read_xlsx_rows
+
+FIELDS = [
+    "IDENTBROJ", "CRTEZBROJ", "NAZIVDELA", "TEHNPODACI",
+    "KATALBROJ", "FORMAT", "ARHIVA", "KOMENTAR",
+    "OBJEKAT1", "OBJEKAT2", "OBJEKAT3", "OBJEKAT4",
+    "KATALOG", "MAGSIFRA"
+]
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+    '</Types>'
+)
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>'
+    '</Relationships>'
+)
+
+
+def column_letters(idx):
+    letters = ""
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+def make_record(i):
+    return [
+        i, f"{i % 97:02d}-{i:06d}/{i % 7}", f"Vijak M{i % 24 + 4}x{i % 50 + 10}",
+        f"DIN {i % 900 + 100}", f"K-{i % 5000}", ["A4", "A3", "A2", "A1"][i % 4],
+        f"AR{i % 12}", None if i % 3 else "napomena", f"Kran {i % 40}", None,
+        None, None, ["K1", "K2", "K3"][i % 3], f"M{i:07d}",
+    ]
+
+def write_workbook(filename, rows):
+    """Write a minimal xlsx with shared strings, like Excel does"""
+    strings = {}
+
+    def string_index(value):
+        if value not in strings:
+            strings[value] = len(strings)
+        return strings[value]
+
+    sheet = ['<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+             '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>']
+    all_rows = [FIELDS] + [make_record(i) for i in range(1, rows + 1)]
+    for r, values in enumerate(all_rows, start=1):
+        cells = []
+        for c, value in enumerate(values):
+            ref = f"{column_letters(c)}{r}"
+            if value is None:
+                continue
+            if isinstance(value, int):
+                cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+            else:
+                cells.append(f'<c r="{ref}" t="s"><v>{string_index(value)}</v></c>')
+        sheet.append(f'<row r="{r}">{"".join(cells)}</row>')
+    sheet.append("</sheetData></worksheet>")
+
+    shared = ['<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+              f'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" uniqueCount="{len(strings)}">']
+    shared.extend(f"<si><t>{escape(s)}</t></si>" for s in strings)
+    shared.append("</sst>")
+
+    with zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", CONTENT_TYPES)
+        zf.writestr("_rels/.rels", ROOT_RELS)
+        zf.writestr("xl/workbook.xml", WORKBOOK)
+        zf.writestr("xl/_rels/workbook.xml.rels", WORKBOOK_RELS)
+        zf.writestr("xl/worksheets/sheet1.xml", "".join(sheet))
+        zf.writestr("xl/sharedStrings.xml", "".join(shared))
+
+def read_streaming(filename):
+    return list(read_xlsx_rows(filename, FIELDS))
+
+def read_openpyxl(filename):
+    from openpyxl import load_workbook
+    wb = load_workbook(filename, read_only=True, data_only=True)
+    ws = wb.active
+    headers = [cell.value for cell in ws[1]]
+    columns = [headers.index(f) for f in FIELDS]
+    rows = [[row[c] if c < len(row) else None for c in columns]
+            for row in ws.iter_rows(min_row=2, values_only=True)]
+    wb.close()
+    return rows
+
+def measure(fn, filename):
+    start = time.perf_counter()
+    result = fn(filename)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn(filename)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000]
+    try:
+        import openpyxl  # noqa: F401
+        have_openpyxl = True
+    except ImportError:
+        have_openpyxl = False
+        print("openpyxl nije instaliran - meri se samo streaming čitač")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            filename = os.path.join(tmp, f"bench_{rows}.xlsx")
+            write_workbook(filename, rows)
+            size_mb = os.path.getsize(filename) / 1e6
+            print(f"\n{rows} redova ({size_mb:.1f} MB)")
+
+            streamed, t_stream, m_stream = measure(read_streaming, filename)
+            print(f"  streaming:        {t_stream:8.3f} s  peak {m_stream / 1e6:8.1f} MB")
+
+            if have_openpyxl:
+                parsed, t_opx, m_opx = measure(read_openpyxl, filename)
+                print(f"  openpyxl (r/o):   {t_opx:8.3f} s  peak {m_opx / 1e6:8.1f} MB")
+                print(f"  ubrzanje: {t_opx / t_stream:.1f}x, "
+                      f"isti rezultat: {'da' if parsed == streamed else 'NE'}")
+
+if __name__ == "__main__":
+    main()